@@ -1,5 +1,7 @@
 import streamlit as st
 
+from utils.interview_jobs import get_job_queue
+
 def main():
     # Opcional: Define un título de la página y un ícono en la pestaña del navegador
     st.set_page_config(
@@ -8,6 +10,10 @@ def main():
         layout="wide"
     )
 
+    # Arranca la cola de post-procesado de entrevistas: retoma los trabajos
+    # que quedaron pendientes si el servidor se reinició
+    get_job_queue()
+
     # Muestra el logo (ajusta la ruta y ancho/alto a tu gusto)
     st.image("UrgegiLogo.png", width=400)
 
@@ -1,15 +1,26 @@
 import streamlit as st
-import plotly.express as px
-import json
 from streamlit_plotly_events import plotly_events
-from utils.metadata import load_datasets_metadata
 
 # Importamos nuestras utilidades
-from utils.data_loader import load_shapefile, load_csv
+from utils.data_loader import load_shapefile, data_version
+from utils.indicators import list_indicators, load_indicator, indicator_version
 from utils.geoutils import (
     prepare_geodata,
     detect_year_columns,
-    convert_year_to_numeric
+    convert_year_to_numeric,
+    join_warnings
+)
+from utils.spatial_stats import LISA_COLORS, spatial_autocorrelation
+from utils.classification import CLASSIFICATION_SCHEMES, classify_all_years, class_labels
+from utils.charts import build_map_figure, build_raster_map_figure, region_id_from_click, discrete_palette
+from utils.rasterize import (
+    RASTER_WIDTHS,
+    load_label_mask,
+    raster_image_uri,
+    continuous_colors,
+    categorical_colors,
+    use_raster,
+    default_width
 )
 
 st.set_page_config(layout="wide")
@@ -18,40 +29,32 @@ def main():
     st.title("Mapa Interactivo de Datos por Comarca")
 
     # 1. Cargar shapefile
+    shp_path = "data/COMARCAS_5000_ETRS89.shp"
     try:
-        gdf = load_shapefile("data/COMARCAS_5000_ETRS89.shp")
+        gdf = load_shapefile(shp_path)
     except Exception as e:
         st.error(f"Error al leer el shapefile: {e}")
         st.stop()
 
-    # 2. Seleccionar CSV
-    csv_files = {
-        "Porcentaje establecimeintos sector cosntruccion (% sobre total)": "data/Porcentaje establecimientos sector construccion sobre el total.csv",
-        "Contratos Indefinidos": "data/Contratos indefinidos registrados en el ano (% total contratos).csv",
-        "Contratos Anuales": "data/Contratos registrados en el ano ( habitantes).csv",
-        "Densidad comercial minorista": "data/Densidad comercial minorista ( habitantes).csv",
-        "Empleo generado microempresas": "data/Empleo generado por las microempresas (0-9 empleados) (%).csv",
-        "Indice rotación contractual": "data/Indice de rotacion contractual (contratos_personas).csv",
-        "Población contratada año": "data/Poblacion contratada en el ano ( habitantes).csv",
-        "Mayor 16 años. Sector servicios": "data/Poblacion de 16 y mas anos ocupada en el sector servicios (%).csv"
-    }
+    # 2. Seleccionar indicador (CSV o derivado)
     csv_choice = st.sidebar.selectbox(
         "Elige el conjunto de datos a visualizar:",
-        options=list(csv_files.keys())
+        options=list_indicators()
     )
     st.write(f"Has seleccionado: **{csv_choice}**")
 
-    chosen_csv = csv_files[csv_choice]
-
     # 3. Leer el CSV
     try:
-        df = load_csv(chosen_csv)
+        df = load_indicator(csv_choice)
     except Exception as e:
-        st.error(f"Error al leer {chosen_csv}: {e}")
+        st.error(f"Error al leer {csv_choice}: {e}")
         st.stop()
 
     # 4. Preparar los datos (merge, re-proyección, etc.)
-    gdf_merged = prepare_geodata(gdf, df)
+    gdf_merged = prepare_geodata(gdf, df, versions=(data_version(shp_path), indicator_version(csv_choice)))
+    # Avisar de códigos sin pareja o repetidos entre el shapefile y el indicador
+    for aviso in join_warnings(gdf_merged):
+        st.warning(aviso)
 
     # 5. Detectar columnas de tipo año
     year_columns = detect_year_columns(gdf_merged)
@@ -70,35 +73,119 @@ def main():
     )
     st.write(f"Año seleccionado: **{selected_year}**")
 
-    # Calcular centro del mapa
-    bounds = gdf_merged.total_bounds
-    center_lat = (bounds[1] + bounds[3]) / 2
-    center_lon = (bounds[0] + bounds[2]) / 2
-
-    # Convertir GeoDataFrame a GeoJSON
-    geojson_data = json.loads(gdf_merged.to_json())
-
-    # Crear el Choropleth con Plotly
-    fig = px.choropleth_mapbox(
-        data_frame=gdf_merged,
-        geojson=geojson_data,
-        locations="id_region",
-        featureidkey="properties.id_region",
-        color=selected_year,
-        hover_name="COMARCA",
-        hover_data={selected_year: True},
-        color_continuous_scale="YlGnBu",
-        mapbox_style="carto-positron",
-        zoom=7.5,
-        center={"lat": center_lat, "lon": center_lon},
-        opacity=0.7,
+    # Capa a representar: valores del indicador o clusters de autocorrelación espacial
+    map_layer = st.sidebar.radio(
+        "Capa del mapa:",
+        options=["Valores", "Clusters LISA (Moran)"]
     )
 
-    fig.update_layout(
-        margin={"r": 0, "t": 0, "l": 0, "b": 0},
-        coloraxis_colorbar=dict(title=f"{csv_choice} - {selected_year}")
+    # Color del mapa según la capa elegida
+    if map_layer == "Valores":
+        scheme_name = st.sidebar.selectbox(
+            "Clasificación de valores:",
+            options=list(CLASSIFICATION_SCHEMES.keys())
+        )
+        scheme = CLASSIFICATION_SCHEMES[scheme_name]
+
+        if scheme is None:
+            color_args = dict(color=selected_year, color_continuous_scale="YlGnBu")
+        else:
+            n_classes = st.sidebar.slider("Número de clases:", min_value=3, max_value=9, value=5)
+
+            # Cortes y clases de todos los años en una sola pasada (cacheado)
+            breaks, classes = classify_all_years(
+                gdf_merged[year_columns].to_numpy(dtype=float),
+                scheme,
+                n_classes
+            )
+            year_idx = year_columns.index(selected_year)
+            labels = class_labels(breaks[year_idx])
+            class_col = classes[:, year_idx]
+            gdf_merged["Clase"] = [labels[c] if c >= 0 else "Sin datos" for c in class_col]
+
+            if 0 < len(labels) < n_classes:
+                st.sidebar.caption(f"{selected_year} solo tiene {len(labels)} clase(s) distintas.")
+            palette = discrete_palette(len(labels))
+            color_map = dict(zip(labels, palette))
+            color_map["Sin datos"] = "#d9d9d9"
+            color_args = dict(
+                color="Clase",
+                color_discrete_map=color_map,
+                category_orders={"Clase": list(color_map.keys())}
+            )
+    else:
+        contiguity = st.sidebar.selectbox(
+            "Contigüidad:",
+            options=["queen", "rook"],
+            format_func=lambda k: "Reina (comparten algún punto)" if k == "queen" else "Torre (comparten borde)"
+        )
+        alpha = st.sidebar.select_slider("Nivel de significación:", options=[0.01, 0.05, 0.10], value=0.05)
+
+        # Moran global y LISA para todos los años a la vez (cacheado)
+        moran_df, lisa_labels, _ = spatial_autocorrelation(
+            shp_path,
+            contiguity,
+            tuple(gdf_merged["id_region"]),
+            gdf_merged[year_columns].to_numpy(dtype=float),
+            alpha=alpha
+        )
+        year_idx = year_columns.index(selected_year)
+        gdf_merged["Cluster LISA"] = lisa_labels[:, year_idx]
+        color_args = dict(
+            color="Cluster LISA",
+            color_discrete_map=LISA_COLORS,
+            category_orders={"Cluster LISA": list(LISA_COLORS.keys())}
+        )
+
+        moran_year = moran_df.iloc[year_idx]
+        st.write(
+            f"I de Moran global ({selected_year}): **{moran_year['I']:.3f}** "
+            f"(esperado {moran_year['EI']:.3f}, pseudo p-valor {moran_year['p_sim']:.3f})"
+        )
+
+    # Modo de dibujo: con miles de polígonos la coropleta vectorial deja de ser
+    # fluida y se pinta como imagen generada en el servidor
+    render_mode = st.sidebar.radio(
+        "Modo de renderizado:",
+        options=["auto", "vector", "raster"],
+        format_func=lambda m: {"auto": "Automático", "vector": "Vectorial", "raster": "Ráster (imagen)"}[m],
+        horizontal=True
     )
 
+    colorbar_title = f"{csv_choice} - {selected_year}"
+    if use_raster(len(gdf), render_mode):
+        width = st.sidebar.select_slider(
+            "Resolución del ráster (px):",
+            options=RASTER_WIDTHS,
+            value=default_width(len(gdf))
+        )
+        # Máscara polígono -> píxel cacheada: entre años solo cambian los colores
+        region_ids, _, corners, click_lon, click_lat = load_label_mask(shp_path, width)
+        regions = gdf_merged.drop_duplicates(subset="id_region").set_index("id_region")
+
+        color_col = color_args["color"]
+        if "color_discrete_map" in color_args:
+            legend = color_args["color_discrete_map"]
+            region_rgba = categorical_colors(regions[color_col].reindex(region_ids), legend)
+        else:
+            legend = None
+            region_rgba = continuous_colors(regions[color_col].reindex(region_ids).to_numpy(dtype=float))
+
+        fig = build_raster_map_figure(
+            gdf_merged,
+            selected_year,
+            colorbar_title,
+            raster_image_uri(shp_path, width, region_rgba),
+            corners,
+            region_ids,
+            click_lon,
+            click_lat,
+            legend
+        )
+    else:
+        # Crear el Choropleth con Plotly
+        fig = build_map_figure(gdf_merged, selected_year, colorbar_title, color_args)
+
     # Usar streamlit-plotly-events para capturar clics en el mapa
     selected_points = plotly_events(
         fig,
@@ -109,8 +196,10 @@ def main():
 
     # Mostrar estadísticas si se selecciona un punto en el mapa
     if selected_points:
-        selected_region_id = selected_points[0]["pointIndex"]
-        selected_comarca = gdf_merged.iloc[selected_region_id]["COMARCA"]
+        # Con colores por categoría hay una traza por categoría (y en ráster una
+        # traza de puntos): se localiza la región por su id en la traza pulsada
+        selected_region_id = region_id_from_click(fig, selected_points[0])
+        selected_comarca = gdf_merged.loc[gdf_merged["id_region"] == selected_region_id, "COMARCA"].iloc[0]
 
         st.subheader(f"Estadísticas históricas para la comarca: {selected_comarca}")
 
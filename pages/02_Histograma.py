@@ -2,19 +2,33 @@
 
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 
 # Importamos las utilidades para carga y geoprocesado
-from utils.data_loader import load_shapefile, load_csv
+from utils.data_loader import load_shapefile, data_version
+from utils.indicators import list_indicators, load_indicator, indicator_version
 from utils.geoutils import (
     prepare_geodata,
     detect_year_columns,
-    convert_year_to_numeric
+    convert_year_to_numeric,
+    join_warnings
 )
+from utils.charts import to_long_format, build_bar_figure, add_trend_lines
+from utils.trends import TREND_METHODS, MAX_PROJECTION_YEARS, fill_year_gaps, trend_long_format
+from utils.similarity import SIMILARITY_METRICS, combined_distance_matrix, most_similar
+from utils.region_search import load_region_index, region_selector
 
 st.set_page_config(layout="wide")
 # Añadimos un poco de CSS para mejorar la apariencia
 
+def usar_comarcas_similares(comarcas):
+    """
+    Callback: sustituye la selección de comarcas por la de referencia y sus similares.
+    """
+    st.session_state["seleccion_comarcas"] = comarcas
+    # El selector se vuelve a crear con la nueva selección
+    st.session_state.pop("seleccion_comarcas_widget", None)
+
+
 def main():
     st.title("Histograma de evolución de datos por comarca (Comparación)")
 
@@ -25,34 +39,25 @@ def main():
         st.error(f"Error al leer el shapefile: {e}")
         st.stop()
 
-    # 2. Seleccionar CSV
-    csv_files = {
-        "Porcentaje establecimeintos sector construccion (% sobre total)": "data/Porcentaje establecimientos sector construccion sobre el total.csv",
-        "Contratos Indefinidos": "data/Contratos indefinidos registrados en el ano (% total contratos).csv",
-        "Contratos Anuales": "data/Contratos registrados en el ano ( habitantes).csv",
-        "Densidad comercial minorista": "data/Densidad comercial minorista ( habitantes).csv",
-        "Empleo generado microempresas": "data/Empleo generado por las microempresas (0-9 empleados) (%).csv",
-        "Indice rotación contractual": "data/Indice de rotacion contractual (contratos_personas).csv",
-        "Población contratada año": "data/Poblacion contratada en el ano ( habitantes).csv",
-        "Mayor 16 años. Sector servicios": "data/Poblacion de 16 y mas anos ocupada en el sector servicios (%).csv"
-    }
+    # 2. Seleccionar indicador (CSV o derivado)
     csv_choice = st.sidebar.selectbox(
         "Elige el conjunto de datos a visualizar:",
-        options=list(csv_files.keys())
+        options=list_indicators()
     )
     st.write(f"Has seleccionado: **{csv_choice}**")
 
-    chosen_csv = csv_files[csv_choice]
-
     # 3. Cargar CSV
     try:
-        df = load_csv(chosen_csv)
+        df = load_indicator(csv_choice)
     except Exception as e:
-        st.error(f"Error al leer {chosen_csv}: {e}")
+        st.error(f"Error al leer {csv_choice}: {e}")
         st.stop()
 
     # 4. Merge y reproyección
-    gdf_merged = prepare_geodata(gdf, df)
+    gdf_merged = prepare_geodata(gdf, df, versions=(data_version("data/COMARCAS_5000_ETRS89.shp"), indicator_version(csv_choice)))
+    # Avisar de códigos sin pareja o repetidos entre el shapefile y el indicador
+    for aviso in join_warnings(gdf_merged):
+        st.warning(aviso)
 
     # 5. Detectar columnas que representan años
     year_columns = detect_year_columns(gdf_merged)
@@ -64,13 +69,70 @@ def main():
     for ycol in year_columns:
         gdf_merged = convert_year_to_numeric(gdf_merged, ycol)
 
+    # 6b. Relleno de huecos y tendencias (opcional, para todas las comarcas a la vez)
+    with st.sidebar.expander("Huecos y tendencias"):
+        rellenar = st.checkbox("Rellenar años sin dato (interpolación)")
+        mostrar_tendencia = st.checkbox("Mostrar tendencia")
+        metodo_tendencia = st.selectbox("Método de ajuste:", options=list(TREND_METHODS.keys()))
+        anios_proyeccion = st.slider("Años de proyección:", 0, MAX_PROJECTION_YEARS, 0)
+
+    # La tendencia se ajusta siempre sobre los datos observados, no sobre los interpolados
+    gdf_observado = gdf_merged
+    if rellenar:
+        gdf_merged, n_rellenados = fill_year_gaps(gdf_merged, year_columns)
+        st.caption(f"Valores interpolados: {n_rellenados}")
+
     # 7. Seleccionar (multi) comarcas, hasta un máximo de 3
-    regiones_disponibles = gdf_merged["COMARCA"].dropna().unique().tolist()
-    seleccion_comarcas = st.sidebar.multiselect(
+    #    El índice de búsqueda (nombres en castellano y euskera, sin tildes, y
+    #    códigos) se construye una vez por versión de los datos
+    region_index = load_region_index("data/COMARCAS_5000_ETRS89.shp")
+    regiones_disponibles = region_index.names
+    seleccion_comarcas = region_selector(
         "Selecciona una o varias comarcas (máx 3):",
-        options=regiones_disponibles
+        region_index,
+        "seleccion_comarcas"
     )
 
+    # 7b. Buscar comarcas similares a una de referencia (vecinos más próximos)
+    with st.sidebar.expander("Buscar comarcas similares"):
+        comarca_ref = st.selectbox("Comarca de referencia:", options=regiones_disponibles)
+        indicadores_sim = st.multiselect(
+            "Indicadores a comparar:",
+            options=list_indicators(),
+            default=[csv_choice]
+        )
+        metrica = st.selectbox("Métrica:", options=list(SIMILARITY_METRICS.keys()))
+        k_similares = st.number_input("Número de comarcas similares:", min_value=1, max_value=10, value=5)
+
+        if indicadores_sim:
+            codes, dist = combined_distance_matrix(
+                [load_indicator(name) for name in indicadores_sim],
+                SIMILARITY_METRICS[metrica]
+            )
+            nombre_por_codigo = gdf_merged.set_index("id_region")["COMARCA"]
+            codigo_ref = gdf_merged.loc[gdf_merged["COMARCA"] == comarca_ref, "id_region"].iloc[0]
+
+            df_similares = pd.DataFrame()
+            if codigo_ref in codes:
+                df_similares = most_similar(codes, dist, codigo_ref, int(k_similares))
+                df_similares["Comarca"] = df_similares["id_region"].map(nombre_por_codigo)
+                df_similares = df_similares.dropna(subset=["Comarca"])
+
+            if not df_similares.empty:
+                st.dataframe(
+                    df_similares[["Comarca", "Distancia"]],
+                    hide_index=True,
+                    use_container_width=True
+                )
+                st.button(
+                    "Comparar con las 2 más similares",
+                    on_click=usar_comarcas_similares,
+                    args=([comarca_ref] + df_similares["Comarca"].head(2).tolist(),)
+                )
+            else:
+                # Sin datos de la comarca de referencia (o sin años en común con ninguna otra)
+                st.warning("La comarca de referencia no tiene datos en los indicadores elegidos.")
+
     # Controlar si se seleccionan más de 3
     if len(seleccion_comarcas) > 3:
         st.error("Solo puedes seleccionar hasta 3 comarcas a la vez.")
@@ -82,45 +144,21 @@ def main():
         st.stop()
 
     # 8. Creamos un DataFrame "largo" (melt) para plotear las series de años
-    #    Columns a mantener: "COMARCA", {todas las year_columns}
-    #    Pasamos de wide a long: col "Año", col "Valor"
-    df_plot_list = []
-    for comarca in seleccion_comarcas:
-        row_region = gdf_merged[gdf_merged["COMARCA"] == comarca]
-        if row_region.empty:
-            continue
-
-        # Para cada columna de año, guardamos (comarca, año, valor)
-        for col in year_columns:
-            valor = row_region[col].values[0]  # la comarca aparece una vez en gdf_merged
-            df_plot_list.append({
-                "COMARCA": comarca,
-                "Año": col,
-                "Valor": valor
-            })
-
-    df_plot = pd.DataFrame(df_plot_list)
+    #    Pasamos de wide a long: col "COMARCA", col "Año", col "Valor"
+    df_plot = to_long_format(gdf_merged, year_columns, comarcas=seleccion_comarcas)
 
     # 9. Creamos el histograma (barras) con Plotly
     #    Cada comarca será una serie distinta (usando el color)
-    fig = px.bar(
-        df_plot,
-        x="Año",
-        y="Valor",
-        color="COMARCA",
-        barmode="group",
-        title="Evolución de valores por comarca",
-        template="plotly_white",
-        labels={"Valor": csv_choice},
-        text="Valor"  # Para que muestre el valor encima de cada barra
-    )
-    fig.update_layout(
-        autosize=False,
-        width=1500,  # Ajusta el ancho del gráfico
-        height=600   # Ajusta la altura del gráfico si es necesario
-    )
-    # Ajustamos la posición del texto
-    fig.update_traces(textposition="outside")
+    fig = build_bar_figure(df_plot, csv_choice)
+    if mostrar_tendencia:
+        df_tendencia = trend_long_format(
+            gdf_observado,
+            year_columns,
+            seleccion_comarcas,
+            TREND_METHODS[metodo_tendencia],
+            anios_proyeccion
+        )
+        add_trend_lines(fig, df_tendencia, year_as_str=True)
 
     # Presentamos el histograma
     st.plotly_chart(fig, use_container_width=True)
@@ -133,12 +171,19 @@ def main():
         media_val = sub["Valor"].mean()
         min_val = sub["Valor"].min()
         max_val = sub["Valor"].max()
-        stats_data.append({
+        fila = {
             "Comarca": comarca,
             "Media": f"{media_val:.2f}",
             "Mínimo": f"{min_val:.2f}",
             "Máximo": f"{max_val:.2f}"
-        })
+        }
+        if mostrar_tendencia:
+            pendiente = df_tendencia.loc[df_tendencia["COMARCA"] == comarca, "Pendiente"]
+            # Sin pendiente (menos de dos años con dato) se muestra "-"
+            fila["Tendencia anual"] = (
+                f"{pendiente.iloc[0]:+.2f}" if not pendiente.empty and pd.notna(pendiente.iloc[0]) else "-"
+            )
+        stats_data.append(fila)
 
     st.subheader("Estadísticas")
     # Mostramos en forma de tabla
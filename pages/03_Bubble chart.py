@@ -1,15 +1,18 @@
 # pages/04_bubble_chart.py
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 
-from utils.data_loader import load_shapefile, load_csv
+from utils.data_loader import load_shapefile, data_version
+from utils.indicators import list_indicators, load_indicator, indicator_version
 from utils.geoutils import (
     prepare_geodata,
     detect_year_columns,
-    convert_year_to_numeric
+    convert_year_to_numeric,
+    join_warnings
 )
+from utils.charts import to_long_format, build_bubble_figure, add_trend_lines
+from utils.region_search import load_region_index, region_selector
+from utils.trends import TREND_METHODS, MAX_PROJECTION_YEARS, fill_year_gaps, trend_long_format
 
 st.set_page_config(layout="wide")
 
@@ -23,34 +26,25 @@ def main():
         st.error(f"Error al leer el shapefile: {e}")
         st.stop()
 
-    # 2. Seleccionar CSV
-    csv_files = {
-        "Porcentaje establecimeintos sector construccion (% sobre total)": "data/Porcentaje establecimientos sector construccion sobre el total.csv",
-        "Contratos Indefinidos": "data/Contratos indefinidos registrados en el ano (% total contratos).csv",
-        "Contratos Anuales": "data/Contratos registrados en el ano ( habitantes).csv",
-        "Densidad comercial minorista": "data/Densidad comercial minorista ( habitantes).csv",
-        "Empleo generado microempresas": "data/Empleo generado por las microempresas (0-9 empleados) (%).csv",
-        "Indice rotación contractual": "data/Indice de rotacion contractual (contratos_personas).csv",
-        "Población contratada año": "data/Poblacion contratada en el ano ( habitantes).csv",
-        "Mayor 16 años. Sector servicios": "data/Poblacion de 16 y mas anos ocupada en el sector servicios (%).csv"
-    }
+    # 2. Seleccionar indicador (CSV o derivado)
     csv_choice = st.sidebar.selectbox(
         "Elige el conjunto de datos a visualizar:",
-        options=list(csv_files.keys())
+        options=list_indicators()
     )
     st.write(f"Has seleccionado: **{csv_choice}**")
 
-    chosen_csv = csv_files[csv_choice]
-
     # 3. Cargar CSV
     try:
-        df = load_csv(chosen_csv)
+        df = load_indicator(csv_choice)
     except Exception as e:
-        st.error(f"Error al leer {chosen_csv}: {e}")
+        st.error(f"Error al leer {csv_choice}: {e}")
         st.stop()
 
     # 4. Merge y reproyección
-    gdf_merged = prepare_geodata(gdf, df)
+    gdf_merged = prepare_geodata(gdf, df, versions=(data_version("data/COMARCAS_5000_ETRS89.shp"), indicator_version(csv_choice)))
+    # Avisar de códigos sin pareja o repetidos entre el shapefile y el indicador
+    for aviso in join_warnings(gdf_merged):
+        st.warning(aviso)
 
     # 5. Detectar columnas de años
     year_columns = detect_year_columns(gdf_merged)
@@ -62,26 +56,34 @@ def main():
     for ycol in year_columns:
         gdf_merged = convert_year_to_numeric(gdf_merged, ycol)
 
+    # 6b. Relleno de huecos y tendencias (opcional, para todas las comarcas a la vez)
+    with st.sidebar.expander("Huecos y tendencias"):
+        rellenar = st.checkbox("Rellenar años sin dato (interpolación)")
+        mostrar_tendencia = st.checkbox("Mostrar tendencia")
+        metodo_tendencia = st.selectbox("Método de ajuste:", options=list(TREND_METHODS.keys()))
+        anios_proyeccion = st.slider("Años de proyección:", 0, MAX_PROJECTION_YEARS, 0)
+
+    # La tendencia se ajusta siempre sobre los datos observados, no sobre los interpolados
+    gdf_observado = gdf_merged
+    if rellenar:
+        gdf_merged, n_rellenados = fill_year_gaps(gdf_merged, year_columns)
+        st.caption(f"Valores interpolados: {n_rellenados}")
+
     # 7. Construimos un DF "largo" (Año, Valor, COMARCA)
-    df_bubble_list = []
-    for idx, row in gdf_merged.iterrows():
-        comarca_name = row["COMARCA"]
-        for col in year_columns:
-            val = row[col]
-            df_bubble_list.append({
-                "COMARCA": comarca_name,
-                "Año": int(col),  # Convertimos col (string) a int para el eje X
-                "Valor": val
-            })
-
-    df_bubble = pd.DataFrame(df_bubble_list)
+    #    Año como int para el eje X
+    df_bubble = to_long_format(gdf_merged, year_columns, year_as_int=True)
 
     # 8. Selección de comarcas (primera opción = "Todas")
-    regiones_disponibles = sorted(df_bubble["COMARCA"].dropna().unique().tolist())
-    seleccion = st.sidebar.multiselect(
+    #    El índice de búsqueda (nombres en castellano y euskera, sin tildes, y
+    #    códigos) se construye una vez por versión de los datos
+    region_index = load_region_index("data/COMARCAS_5000_ETRS89.shp")
+    regiones_disponibles = region_index.sorted_names
+    seleccion = region_selector(
         "Selecciona las comarcas (o 'Todas'):",
-        options=["Todas"] + regiones_disponibles,
-        default=["ALTO DEBA"]
+        region_index,
+        "seleccion_bubble",
+        default=["ALTO DEBA"],
+        extra_options=["Todas"]
     )
 
     # Si "Todas" está en la lista, usamos todas las regiones
@@ -94,23 +96,17 @@ def main():
     df_filtrado = df_bubble[df_bubble["COMARCA"].isin(regiones_filtradas)]
 
     # 10. Creamos el bubble chart con Plotly
-    #     - x = Año, y = Valor, color = COMARCA, size = Valor
-    fig = px.scatter(
-        df_filtrado,
-        x="Año",
-        y="Valor",
-        color="COMARCA",
-        size="Valor",
-        hover_data=["COMARCA"],
-        title=f"Bubble Chart: {csv_choice}",
-        labels={"Valor": csv_choice},
-        height=600
-    )
-    # Ajustes opcionales
-    fig.update_layout(
-        xaxis=dict(tickmode="linear"),  # Para que muestre todos los años en secuencia
-        margin={"r":20,"t":40,"l":40,"b":20}
-    )
+    #     - x = Año, y = Valor, color = COMARCA, size = |Valor|
+    fig = build_bubble_figure(df_filtrado, csv_choice)
+    if mostrar_tendencia:
+        df_tendencia = trend_long_format(
+            gdf_observado,
+            year_columns,
+            regiones_filtradas,
+            TREND_METHODS[metodo_tendencia],
+            anios_proyeccion
+        )
+        add_trend_lines(fig, df_tendencia)
 
     st.plotly_chart(fig, use_container_width=True)
 
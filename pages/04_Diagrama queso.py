@@ -1,10 +1,11 @@
 # pages/03_pie_chart.py
 
 import streamlit as st
-import plotly.express as px
-import pandas as pd
-from utils.data_loader import load_shapefile, load_csv
-from utils.geoutils import prepare_geodata, detect_year_columns, convert_year_to_numeric
+from utils.data_loader import load_shapefile, data_version
+from utils.indicators import list_indicators, load_indicator, indicator_version
+from utils.geoutils import prepare_geodata, detect_year_columns, convert_year_to_numeric, join_warnings
+from utils.charts import build_pie_figure
+from utils.trends import fill_year_gaps
 
 st.set_page_config(layout="wide")
 
@@ -18,34 +19,25 @@ def main():
         st.error(f"Error al leer el shapefile: {e}")
         st.stop()
 
-    # 2. Seleccionar CSV
-    csv_files = {
-        "Porcentaje establecimeintos sector construccion (% sobre total)": "data/Porcentaje establecimientos sector construccion sobre el total.csv",
-        "Contratos Indefinidos": "data/Contratos indefinidos registrados en el ano (% total contratos).csv",
-        "Contratos Anuales": "data/Contratos registrados en el ano ( habitantes).csv",
-        "Densidad comercial minorista": "data/Densidad comercial minorista ( habitantes).csv",
-        "Empleo generado microempresas": "data/Empleo generado por las microempresas (0-9 empleados) (%).csv",
-        "Indice rotación contractual": "data/Indice de rotacion contractual (contratos_personas).csv",
-        "Población contratada año": "data/Poblacion contratada en el ano ( habitantes).csv",
-        "Mayor 16 años. Sector servicios": "data/Poblacion de 16 y mas anos ocupada en el sector servicios (%).csv"
-    }
+    # 2. Seleccionar indicador (CSV o derivado que se pueda repartir como un total)
     csv_choice = st.sidebar.selectbox(
         "Elige el conjunto de datos a visualizar:",
-        options=list(csv_files.keys())
+        options=list_indicators(additive_only=True)
     )
     st.write(f"Has seleccionado: **{csv_choice}**")
 
-    chosen_csv = csv_files[csv_choice]
-
     # 3. Cargar CSV
     try:
-        df = load_csv(chosen_csv)
+        df = load_indicator(csv_choice)
     except Exception as e:
-        st.error(f"Error al leer {chosen_csv}: {e}")
+        st.error(f"Error al leer {csv_choice}: {e}")
         st.stop()
 
     # 4. Merge y reproyección
-    gdf_merged = prepare_geodata(gdf, df)
+    gdf_merged = prepare_geodata(gdf, df, versions=(data_version("data/COMARCAS_5000_ETRS89.shp"), indicator_version(csv_choice)))
+    # Avisar de códigos sin pareja o repetidos entre el shapefile y el indicador
+    for aviso in join_warnings(gdf_merged):
+        st.warning(aviso)
 
     # 5. Detectar columnas de tipo año
     year_columns = detect_year_columns(gdf_merged)
@@ -60,7 +52,16 @@ def main():
     )
 
     # 7. Convertir la columna de año a numérico
-    gdf_merged = convert_year_to_numeric(gdf_merged, selected_year)
+    #    Para interpolar hacen falta todos los años (los huecos se rellenan con
+    #    los años vecinos de cada comarca)
+    rellenar = st.sidebar.checkbox("Rellenar años sin dato (interpolación)")
+    if rellenar:
+        for ycol in year_columns:
+            gdf_merged = convert_year_to_numeric(gdf_merged, ycol)
+        gdf_merged, n_rellenados = fill_year_gaps(gdf_merged, year_columns)
+        st.caption(f"Valores interpolados: {n_rellenados}")
+    else:
+        gdf_merged = convert_year_to_numeric(gdf_merged, selected_year)
 
     st.write(f"Año seleccionado: **{selected_year}**")
 
@@ -71,14 +72,16 @@ def main():
     # Opcional: eliminar filas con NaN
     df_pie.dropna(subset=["Valor"], inplace=True)
 
+    # Un diagrama de queso solo admite partes no negativas (Plotly omite las negativas)
+    if (df_pie["Valor"] < 0).any():
+        st.warning(
+            "Este indicador tiene valores negativos en el año seleccionado y no se "
+            "puede representar como reparto de un total."
+        )
+        st.stop()
+
     # 9. Construir el pie chart con Plotly
-    fig = px.pie(
-        df_pie,
-        names="COMARCA",
-        values="Valor",
-        title=f"Distribución de {csv_choice} en {selected_year}",
-        hole=0.0  # 0 para un pie clásico; >0 para un donut
-    )
+    fig = build_pie_figure(df_pie, csv_choice, selected_year)
     st.plotly_chart(fig, use_container_width=True)
 
     # 10. Expositor de datos: región con máximo, mínimo y media global
@@ -1,5 +1,8 @@
 import streamlit as st
 from utils.territorial_chat import TerritorialChat
+from utils.session_store import get_session_store, current_session_id
+from utils.chat_transcript import render_transcript, reset_transcript
+from utils.interview_jobs import get_job_queue
 
 # Configuración de la página
 st.set_page_config(
@@ -12,11 +15,7 @@ st.set_page_config(
 CUSTOM_CSS = """
 <style>
     .chat-box {
-        max-height: 500px;
-        overflow-y: auto;
-        padding: 1rem;
-        border: 1px solid #ccc;
-        border-radius: 15px;
+        padding: 0 1rem;
         background-color: #ffffff;
     }
     .chat-bubble {
@@ -53,11 +52,21 @@ CUSTOM_CSS = """
 
 st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
-# Inicializar la instancia de chat en la sesión
-if "chat" not in st.session_state:
-    st.session_state["chat"] = TerritorialChat()
+# Recuperar la entrevista de esta sesión desde el almacén del servidor
+# (en st.session_state solo se guarda su identificador)
+session_store = get_session_store()
+session_id = current_session_id()
 
-chat_instance = st.session_state["chat"]
+# La cola de post-procesado arranca con la página (retoma los trabajos pendientes)
+get_job_queue()
+
+
+def load_chat() -> TerritorialChat:
+    saved_state = session_store.get(session_id)
+    return TerritorialChat.from_dict(saved_state) if saved_state else TerritorialChat()
+
+
+chat_instance = load_chat()
 
 st.title("💬 Chat Territorial Avanzado")
 
@@ -67,61 +76,67 @@ st.write(
     "Podrás profundizar con preguntas de seguimiento en caso de que el sistema "
     "considere necesario más detalles."
 )
-
-# =========================
-# BARRA DE PROGRESO
-# =========================
-num_questions = len(chat_instance.mandatory_questions)
-current_index = chat_instance.mandatory_index
-
-if num_questions > 0:
-    progress_percent = (current_index / num_questions) * 100
-else:
-    progress_percent = 100
-
-st.markdown("#### Progreso de la Entrevista")
-st.markdown(
-    f"""
-    <div class="progress-bar">
-        <div class="progress-fill" style="width: {progress_percent}%;"></div>
-    </div>
-    """,
-    unsafe_allow_html=True
+st.caption(
+    "Tus respuestas se guardan en este navegador para que puedas retomar la "
+    "entrevista. Si usas un equipo compartido, pulsa «Reiniciar Chat» al terminar."
 )
 
 # =========================
-# SECCIÓN DE CHAT
+# PROGRESO, CONVERSACIÓN Y RESPUESTA
 # =========================
-st.markdown("### Conversación")
-with st.container():
-    st.markdown('<div class="chat-box">', unsafe_allow_html=True)
-    for msg in chat_instance.conversation_history:
-        if msg["role"] == "system":
-            continue
-        bubble_class = "assistant-bubble" if msg["role"] == "assistant" else "user-bubble"
-        st.markdown(
-            f'<div class="chat-bubble {bubble_class}">{msg["content"]}</div>',
-            unsafe_allow_html=True
+# Todo el bloque es un fragmento: al enviar una respuesta solo se vuelve a
+# ejecutar esta parte, y la conversación se dibuja por ventanas
+# (ver utils/chat_transcript.py), así que cada turno cuesta lo mismo
+# aunque la entrevista sea larga.
+@st.fragment
+def chat_section():
+    # Al terminar la entrevista se recarga toda la página (formulario final)
+    if st.session_state.pop("chat_just_completed", False):
+        st.rerun()
+
+    chat_instance = load_chat()
+
+    num_questions = len(chat_instance.mandatory_questions)
+    current_index = chat_instance.mandatory_index
+
+    if num_questions > 0:
+        progress_percent = (current_index / num_questions) * 100
+    else:
+        progress_percent = 100
+
+    st.markdown("#### Progreso de la Entrevista")
+    st.markdown(
+        f"""
+        <div class="progress-bar">
+            <div class="progress-fill" style="width: {progress_percent}%;"></div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+
+    st.markdown("### Conversación")
+    render_transcript(chat_instance.conversation_history)
+
+    if not chat_instance.chat_complete:
+        def submit():
+            user_response = st.session_state.user_input
+            if user_response.strip():
+                chat_instance.add_user_answer(user_response)
+                session_store.put(session_id, chat_instance.to_dict())
+                if chat_instance.chat_complete:
+                    st.session_state["chat_just_completed"] = True
+            st.session_state.user_input = ""  # Limpiar el campo de entrada
+
+        st.text_input(
+            "Escribe aquí tu respuesta:",
+            key="user_input",
+            on_change=submit
         )
-    st.markdown('</div>', unsafe_allow_html=True)
+    else:
+        st.success("¡Has completado todas las preguntas obligatorias!")
 
-# =========================
-# CONTROLES PARA RESPUESTAS DEL USUARIO
-# =========================
-if not chat_instance.chat_complete:
-    def submit():
-        user_response = st.session_state.user_input
-        if user_response.strip():
-            chat_instance.add_user_answer(user_response)
-        st.session_state.user_input = ""  # Limpiar el campo de entrada
-
-    st.text_input(
-        "Escribe aquí tu respuesta:",
-        key="user_input",
-        on_change=submit
-    )
-else:
-    st.success("¡Has completado todas las preguntas obligatorias!")
+
+chat_section()
 
 # =========================
 # FORMULARIO FINAL (Contacto)
@@ -156,8 +171,9 @@ with col1:
 
 with col2:
     if st.button("Reiniciar Chat"):
-        # Eliminamos la instancia del estado para arrancar desde cero
-        st.session_state.pop("chat", None)
+        # Eliminamos la entrevista del almacén para arrancar desde cero
+        session_store.discard(session_id)
+        reset_transcript()
         # No llamamos a experimental_rerun(), simplemente la app se vuelve a
-        # ejecutar y, al no encontrar "chat" en session_state,
+        # ejecutar y, al no encontrar la sesión en el almacén,
         # creará una instancia nueva.
@@ -0,0 +1,105 @@
+# scripts/bench_startup.py
+"""
+Perfil de tiempo de importación y benchmark de arranque en frío por página.
+
+Uso (desde la raíz del repositorio):
+
+    python -m scripts.bench_startup                 # todas las páginas
+    python -m scripts.bench_startup --runs 5 --top 15 "pages/05_Tablas.py"
+
+Para cada página se leen sus imports de nivel de módulo (sin ejecutarla) y:
+  - arranque en frío: se importan en un intérprete nuevo, `--runs` veces,
+    y se informa de la mediana del tiempo de importación;
+  - perfil: se repite una vez con `python -X importtime` y se listan los
+    paquetes de primer nivel que más tiempo acumulan.
+"""
+
+import argparse
+import ast
+import glob
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def page_imports(page_path: str) -> list:
+    """
+    Devuelve las sentencias import de nivel de módulo de una página, como texto.
+    """
+    with open(page_path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=page_path)
+    return [
+        ast.unparse(node) for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+    ]
+
+
+def _run_imports(statements: list, importtime: bool = False):
+    """
+    Ejecuta los imports en un proceso nuevo. Devuelve (segundos, stderr).
+    """
+    code = (
+        "import time\n"
+        "t0 = time.perf_counter()\n"
+        + "\n".join(statements)
+        + "\nprint(time.perf_counter() - t0)\n"
+    )
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    env = {**os.environ, "PYTHONPATH": os.getcwd() + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def top_level_packages(importtime_stderr: str, top: int) -> list:
+    """
+    Agrupa la salida de -X importtime por paquete de primer nivel y devuelve los
+    `top` con mayor tiempo acumulado (en segundos).
+    """
+    totals = {}
+    for line in importtime_stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us, indent, module = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:  # importado directamente (no como dependencia de otro)
+            package = module.split(".")[0]
+            totals[package] = totals.get(package, 0) + cumulative_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    return [(package, us / 1e6) for package, us in ranked[:top]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío de las páginas.")
+    parser.add_argument("pages", nargs="*", help="Páginas a medir (por defecto: Home.py y pages/*.py)")
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones por página (se usa la mediana)")
+    parser.add_argument("--top", type=int, default=8, help="Paquetes a mostrar en el perfil")
+    args = parser.parse_args(argv)
+
+    pages = args.pages or ["Home.py"] + sorted(glob.glob("pages/*.py"))
+
+    summary = []
+    for page in pages:
+        statements = page_imports(page)
+        times = [_run_imports(statements)[0] for _ in range(args.runs)]
+        _, profile = _run_imports(statements, importtime=True)
+        median = statistics.median(times)
+        summary.append((page, median))
+
+        print(f"\n{page}: {median:.2f} s (mediana de {args.runs})")
+        for package, seconds in top_level_packages(profile, args.top):
+            print(f"    {package:<28} {seconds:6.3f} s")
+
+    print("\nResumen (arranque en frío, imports de la página):")
+    for page, median in summary:
+        print(f"    {page:<32} {median:6.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# scripts/export_report.py
+"""
+Exportación estática (sin interfaz) de mapas y gráficos para todos los
+indicadores registrados y todos sus años.
+
+Uso (desde la raíz del repositorio):
+
+    python -m scripts.export_report --out informes --formats html png --workers 8
+
+Genera, para cada indicador:
+    <out>/<indicador>/mapa_<año>.<fmt>
+    <out>/<indicador>/queso_<año>.<fmt>
+    <out>/<indicador>/histograma.<fmt>
+    <out>/<indicador>/burbujas.<fmt>
+
+Las figuras se construyen con las mismas funciones que usan las páginas
+(utils/charts.py). El trabajo se reparte en un pool de procesos; cada proceso
+carga la geometría una sola vez. Un manifiesto con el hash de las entradas de
+cada salida permite saltarse las que no han cambiado.
+
+Por defecto la geometría se simplifica con una tolerancia de 25 m (invisible
+al zoom del mapa), lo que reduce el tamaño y el tiempo de cada mapa en un
+orden de magnitud; --simplify 0 usa la geometría completa.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SHP_PATH = "data/COMARCAS_5000_ETRS89.shp"
+CHART_TYPES = ["mapa", "queso", "histograma", "burbujas"]
+YEARLY_CHARTS = {"mapa", "queso"}
+MANIFEST_NAME = "manifest.json"
+
+# Código cuyo cambio obliga a regenerar las salidas
+CODE_DEPENDENCIES = [
+    "utils/charts.py",
+    "utils/derived_indicators.py",
+    "utils/geoutils.py",
+    "utils/indicators.py",
+    "utils/data_loader.py",
+    "scripts/export_report.py",
+]
+
+# Estado de cada proceso del pool (se inicializa una vez por proceso)
+_WORKER_SHP_PATH = None
+_WORKER_GDF = None
+_WORKER_GEOJSON = None
+_WORKER_PREPARED = {}
+
+
+def _quiet_streamlit():
+    """
+    Fuera de `streamlit run` las cachés funcionan en memoria pero emiten avisos.
+    La configuración se carga antes: al cargarse restablece el nivel de log.
+    """
+    import streamlit.config
+    import streamlit.logger
+
+    streamlit.config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+
+
+def file_hash(path: str) -> str:
+    """
+    SHA-256 del contenido de un fichero.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def shapefile_hash(shp_path: str) -> str:
+    """
+    Hash combinado del .shp y de sus ficheros auxiliares (.dbf, .shx, .prj, ...).
+    """
+    stem, _ = os.path.splitext(shp_path)
+    folder = os.path.dirname(shp_path) or "."
+    base = os.path.basename(stem)
+    parts = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if os.path.splitext(name)[0] == base
+    )
+    return hashlib.sha256("".join(file_hash(p) for p in parts).encode()).hexdigest()
+
+
+def load_manifest(out_dir: str) -> dict:
+    """
+    Lee el manifiesto {ruta de salida: hash de entradas} de la carpeta de salida.
+    """
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(out_dir: str, manifest: dict):
+    """
+    Escribe el manifiesto de forma atómica (fichero temporal + rename).
+    """
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------------------------------------------------
+# Proceso trabajador
+# ----------------------------------------------------------------------------
+
+def _init_worker(shp_path: str, simplify: float):
+    """
+    Inicializador del pool: carga, simplifica (opcional) y reproyecta la
+    geometría una vez por proceso, y prepara su GeoJSON para todos los mapas.
+    """
+    global _WORKER_SHP_PATH, _WORKER_GDF, _WORKER_GEOJSON
+    _quiet_streamlit()
+    from utils.data_loader import load_shapefile
+    from utils.charts import geometry_geojson
+
+    gdf = load_shapefile(shp_path)
+    if simplify > 0:
+        # Tolerancia en metros: el shapefile está en un CRS proyectado (ETRS89 / UTM)
+        gdf["geometry"] = gdf.geometry.simplify(simplify, preserve_topology=True)
+    if gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs(epsg=4326)
+    _WORKER_SHP_PATH = shp_path
+    _WORKER_GDF = gdf
+    _WORKER_GEOJSON = geometry_geojson(gdf)
+
+
+def _prepared_indicator(name: str):
+    """
+    Merge + conversión numérica de un indicador (igual que en las páginas),
+    memoizado dentro del proceso.
+    """
+    if name not in _WORKER_PREPARED:
+        from utils.data_loader import data_version
+        from utils.indicators import load_indicator, indicator_version
+        from utils.geoutils import prepare_geodata, detect_year_columns, convert_year_to_numeric
+
+        versions = (data_version(_WORKER_SHP_PATH), indicator_version(name))
+        gdf_merged = prepare_geodata(_WORKER_GDF.copy(), load_indicator(name), versions=versions)
+        year_columns = detect_year_columns(gdf_merged)
+        for col in year_columns:
+            gdf_merged = convert_year_to_numeric(gdf_merged, col)
+        _WORKER_PREPARED[name] = (gdf_merged, year_columns)
+    return _WORKER_PREPARED[name]
+
+
+def _build_figure(name: str, chart: str, year: str):
+    from utils.charts import (
+        to_long_format,
+        build_map_figure,
+        build_bar_figure,
+        build_bubble_figure,
+        build_pie_figure,
+    )
+
+    gdf_merged, year_columns = _prepared_indicator(name)
+    comarcas = gdf_merged["COMARCA"].dropna().unique().tolist()
+
+    if chart == "mapa":
+        return build_map_figure(gdf_merged, year, f"{name} - {year}", geojson_data=_WORKER_GEOJSON)
+    if chart == "queso":
+        df_pie = gdf_merged[["COMARCA", year]].copy()
+        df_pie.columns = ["COMARCA", "Valor"]
+        df_pie.dropna(subset=["Valor"], inplace=True)
+        if (df_pie["Valor"] < 0).any():
+            raise ValueError("Valores negativos: no se puede representar como reparto de un total.")
+        return build_pie_figure(df_pie, name, year)
+    if chart == "histograma":
+        return build_bar_figure(to_long_format(gdf_merged, year_columns, comarcas=comarcas), name)
+    if chart == "burbujas":
+        return build_bubble_figure(to_long_format(gdf_merged, year_columns, year_as_int=True), name)
+    raise ValueError(f"Tipo de gráfico desconocido: {chart}")
+
+
+def render_task(task: dict) -> dict:
+    """
+    Genera una salida. Devuelve la tarea con 'error' si ha fallado.
+    """
+    try:
+        fig = _build_figure(task["indicator"], task["chart"], task["year"])
+        os.makedirs(os.path.dirname(task["path"]), exist_ok=True)
+        tmp_path = task["path"] + ".tmp"
+        if task["format"] == "html":
+            fig.write_html(tmp_path, include_plotlyjs="cdn")
+        else:
+            fig.write_image(tmp_path, format=task["format"])
+        os.replace(tmp_path, task["path"])
+        return task
+    except Exception as e:
+        return {**task, "error": f"{type(e).__name__}: {e}"}
+
+
+# ----------------------------------------------------------------------------
+# Planificación
+# ----------------------------------------------------------------------------
+
+def plan_tasks(out_dir: str, formats: list, charts: list, indicators: list, simplify: float = 0.0) -> list:
+    """
+    Enumera todas las salidas (indicador × año × tipo × formato) con el hash de
+    sus entradas: CSV de origen, geometría, definición del indicador y código.
+    Como en la página del diagrama de queso, no se generan quesos de los
+    indicadores no aditivos ni de los años con valores negativos.
+    """
+    from utils.indicators import indicator_sources, indicator_slug, load_indicator, list_indicators
+    from utils.derived_indicators import DERIVED_INDICATORS
+
+    pie_indicators = set(list_indicators(additive_only=True))
+    skipped_pies = 0
+
+    code_hash = hashlib.sha256(
+        "".join(file_hash(path) for path in CODE_DEPENDENCIES).encode()
+    ).hexdigest()
+    geo_hash = shapefile_hash(SHP_PATH)
+    source_hashes = {}
+
+    tasks = []
+    for name in indicators:
+        sources = indicator_sources(name)
+        for path in sources:
+            if path not in source_hashes:
+                source_hashes[path] = file_hash(path)
+
+        input_key = json.dumps({
+            "sources": [source_hashes[path] for path in sources],
+            "spec": DERIVED_INDICATORS.get(name),
+            "geometry": geo_hash,
+            "simplify": simplify,
+            "code": code_hash,
+        }, sort_keys=True)
+
+        df = load_indicator(name)
+        years = [str(col) for col in df.columns if str(col).isdigit()]
+        folder = os.path.join(out_dir, indicator_slug(name))
+
+        # Años que se pueden repartir como un total (sin valores negativos)
+        pie_years = [year for year in years if name in pie_indicators and not _has_negative(df[year])]
+        skipped_pies += len(years) - len(pie_years) if "queso" in charts else 0
+
+        for chart in charts:
+            chart_years = pie_years if chart == "queso" else years
+            for year in (chart_years if chart in YEARLY_CHARTS else [None]):
+                for fmt in formats:
+                    filename = f"{chart}_{year}.{fmt}" if year else f"{chart}.{fmt}"
+                    task_key = f"{input_key}|{chart}|{year}|{fmt}"
+                    tasks.append({
+                        "indicator": name,
+                        "chart": chart,
+                        "year": year,
+                        "format": fmt,
+                        "path": os.path.join(folder, filename),
+                        "hash": hashlib.sha256(task_key.encode()).hexdigest(),
+                    })
+    if skipped_pies:
+        print(f"{skipped_pies} diagramas de queso omitidos (indicador no aditivo o valores negativos).")
+    return tasks
+
+
+def _has_negative(column) -> bool:
+    """
+    ¿Hay valores negativos en una columna de año (texto con coma decimal o número)?
+    """
+    import pandas as pd
+
+    values = pd.to_numeric(column.astype(str).str.replace(",", "."), errors="coerce")
+    return bool((values < 0).any())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta mapas y gráficos de todos los indicadores.")
+    parser.add_argument("--out", default="informes", help="Carpeta de salida (por defecto: informes)")
+    parser.add_argument("--formats", nargs="+", default=["html"], choices=["html", "png", "svg"])
+    parser.add_argument("--charts", nargs="+", default=CHART_TYPES, choices=CHART_TYPES)
+    parser.add_argument("--indicators", nargs="+", default=None, help="Nombres de indicadores (por defecto: todos)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Número de procesos")
+    parser.add_argument("--simplify", type=float, default=25.0,
+                        help="Tolerancia de simplificación de la geometría en metros (0 = geometría completa, como en las páginas)")
+    parser.add_argument("--force", action="store_true", help="Regenerar aunque las entradas no hayan cambiado")
+    args = parser.parse_args(argv)
+
+    _quiet_streamlit()
+    from utils.indicators import list_indicators
+
+    if {"png", "svg"} & set(args.formats) and importlib.util.find_spec("kaleido") is None:
+        parser.error("Para exportar PNG/SVG hace falta el paquete 'kaleido' (pip install kaleido).")
+
+    indicators = args.indicators or list_indicators()
+    unknown = set(indicators) - set(list_indicators())
+    if unknown:
+        parser.error(f"Indicadores desconocidos: {', '.join(sorted(unknown))}")
+
+    os.makedirs(args.out, exist_ok=True)
+    manifest = load_manifest(args.out)
+    tasks = plan_tasks(args.out, args.formats, args.charts, indicators, args.simplify)
+
+    pending = [
+        task for task in tasks
+        if args.force or manifest.get(task["path"]) != task["hash"] or not os.path.exists(task["path"])
+    ]
+    print(f"{len(tasks)} salidas, {len(tasks) - len(pending)} sin cambios, {len(pending)} por generar.")
+    if not pending:
+        return 0
+
+    # Agrupar por indicador para aprovechar la memoización dentro de cada proceso
+    pending.sort(key=lambda task: (task["indicator"], task["chart"], task["year"] or ""))
+
+    start = time.time()
+    errors = 0
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(SHP_PATH, args.simplify)) as pool:
+            futures = [pool.submit(render_task, task) for task in pending]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                if "error" in result:
+                    errors += 1
+                    print(f"[error] {result['path']}: {result['error']}", file=sys.stderr)
+                else:
+                    manifest[result["path"]] = result["hash"]
+                if done % 50 == 0 or done == len(futures):
+                    print(f"{done}/{len(futures)} ({time.time() - start:.1f} s)")
+    finally:
+        save_manifest(args.out, manifest)
+
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+# scripts/serve_api.py
+"""
+Servidor HTTP local de la API de datos (utils/data_api.py), para que otros
+equipos descarguen los indicadores sin pasar por la interfaz de Streamlit.
+
+Uso (desde la raíz del repositorio):
+
+    python -m scripts.serve_api --port 8502
+
+Ejemplos:
+
+    curl http://127.0.0.1:8502/indicators
+    curl -o contratos.arrow "http://127.0.0.1:8502/indicators/contratos_anuales.arrow?columns=2022,2023"
+    curl --compressed "http://127.0.0.1:8502/geometry.geojson?simplify=50"
+
+Los datos se recargan solos cuando cambian los ficheros de data/ (mismo
+vigilante que la aplicación).
+"""
+
+import argparse
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """
+    Adaptador entre http.server y data_api.handle_request.
+    """
+    server_version = "DashboardGIS-API/1.0"
+
+    def _respond(self):
+        from utils.data_api import handle_request
+
+        status, headers, body = handle_request(self.command, self.path, dict(self.headers.items()))
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self._respond()
+
+    def do_HEAD(self):
+        self._respond()
+
+    def do_POST(self):
+        self._respond()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API local de datos (Arrow, Parquet y GeoJSON).")
+    parser.add_argument("--host", default="127.0.0.1", help="Interfaz de escucha (por defecto: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8502, help="Puerto (por defecto: 8502)")
+    args = parser.parse_args(argv)
+
+    import streamlit.config
+    import streamlit.logger
+
+    # Fuera de `streamlit run` las cachés funcionan en memoria pero emiten avisos.
+    # La configuración se carga antes: al cargarse restablece el nivel de log.
+    streamlit.config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+
+    server = ThreadingHTTPServer((args.host, args.port), ApiRequestHandler)
+    print(f"API de datos en http://{args.host}:{args.port}/indicators")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Los tests importan los módulos de utils/ como lo hacen las páginas (desde la raíz del repo)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
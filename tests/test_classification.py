@@ -0,0 +1,37 @@
+# tests/test_classification.py
+
+import numpy as np
+import pytest
+
+from utils.classification import assign_classes, class_labels, classify_all_years
+
+
+@pytest.mark.parametrize("scheme", ["quantiles", "equal_interval", "jenks"])
+def test_low_cardinality_years_get_distinct_labels(scheme):
+    values = np.array([
+        [1.0, 7.0, np.nan],
+        [1.0, 7.0, np.nan],
+        [1.0, 7.0, np.nan],
+        [2.0, 7.0, np.nan],
+        [2.0, 7.0, np.nan],
+        [3.0, 7.0, np.nan],
+    ])
+    breaks, classes = classify_all_years(values, scheme, 5)
+
+    for year in range(values.shape[1]):
+        labels = class_labels(breaks[year])
+        assert len(labels) == len(set(labels))
+        assert classes[:, year].max() < max(len(labels), 1)
+
+    assert len(class_labels(breaks[0])) <= 3
+    assert class_labels(breaks[1]) == ["7.00 – 7.00"]
+    assert (classes[:, 1] == 0).all()
+    assert class_labels(breaks[2]) == []
+    assert (classes[:, 2] == -1).all()
+
+
+def test_classes_include_their_upper_break():
+    breaks = np.array([[0.0, 1.0, 2.0, np.nan]])
+    values = np.array([[0.0], [1.0], [1.5], [2.0]])
+
+    assert assign_classes(values, breaks)[:, 0].tolist() == [0, 0, 1, 1]
@@ -0,0 +1,52 @@
+# tests/test_geoutils.py
+
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import Point
+
+from utils.geoutils import normalize_region_codes, prepare_geodata
+
+
+def _shapes(codes) -> gpd.GeoDataFrame:
+    return gpd.GeoDataFrame(
+        {"id_region": codes},
+        geometry=[Point(i, 0) for i in range(len(codes))],
+        crs="EPSG:4326",
+    )
+
+
+def _indicator() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Codigo comarca": ["01100", "1200", "1200", "9900"],
+        "Comarca": pd.Categorical(["A", "B", "B2", "Z"]),
+        "2020": ["1,5", "2", "3", "4"],
+    })
+
+
+def test_join_with_versions_matches_uncached_join():
+    codes = [1100, " 1200", "1300"]
+    plain = prepare_geodata(_shapes(codes), _indicator())
+
+    shapes = _shapes(codes)
+    shapes["id_region"] = normalize_region_codes(shapes["id_region"])
+    cached = prepare_geodata(shapes, _indicator(), versions=("shp-v1", ("csv-v1",)))
+    again = prepare_geodata(shapes.copy(), _indicator(), versions=("shp-v1", ("csv-v1",)))
+
+    for merged in (cached, again):
+        pd.testing.assert_frame_equal(pd.DataFrame(plain), pd.DataFrame(merged))
+        assert merged.attrs["join_report"] == plain.attrs["join_report"]
+
+    assert plain["id_region"].tolist() == ["01100", "01200", "01300"]
+    assert plain["Comarca"].tolist()[:2] == ["A", "B"]
+    assert pd.isna(plain["2020"].iloc[2])
+    assert plain.attrs["join_report"] == {
+        "missing": ["01300"],
+        "unknown": ["9900"],
+        "duplicated": ["01200"],
+    }
+
+
+def test_non_numeric_region_codes_are_kept_as_text():
+    codes = normalize_region_codes(pd.Series(["12", " AB ", "1.5"], dtype=object))
+
+    assert codes.tolist() == ["00012", "000AB", "001.5"]
@@ -0,0 +1,54 @@
+# tests/test_interview_jobs.py
+
+from utils.interview_jobs import InterviewJobQueue
+from utils.interview_store import save_interview
+
+
+def _queue(tmp_path, extractor, **kwargs) -> InterviewJobQueue:
+    store_path = str(tmp_path / "entrevistas.json")
+    for interview_id in ("a", "b"):
+        save_interview(store_path, {"id": interview_id, "territorial_info": {}})
+    return InterviewJobQueue(
+        jobs_dir=str(tmp_path / "jobs"), store_path=store_path, extractor=extractor,
+        min_interval=0, **kwargs
+    )
+
+
+def test_enqueue_same_interview_twice_keeps_one_job(tmp_path):
+    queue = _queue(tmp_path, lambda interviews: {iv["id"]: {} for iv in interviews})
+
+    first = queue.enqueue("a")
+    assert queue.enqueue("a") == first
+    assert queue.stats()["pending"] == 1
+
+    assert queue.process_once(force=True) == 1
+    # Ya procesada: un nuevo guardado sí vuelve a encolarla
+    assert queue.enqueue("a") != first
+    assert queue.stats() == {"pending": 1, "done": 1, "failed": 0}
+
+
+def test_job_interrupted_by_stop_keeps_its_attempts(tmp_path):
+    def extractor(interviews):
+        queue.stop()
+        raise ConnectionError("servidor detenido")
+
+    queue = _queue(tmp_path, extractor)
+    queue.enqueue("a")
+
+    assert queue.process_once(force=True) == 0
+    reloaded = _queue(tmp_path, extractor)
+    assert [(job["interview_id"], job["attempts"]) for job in reloaded.pending_jobs()] == [("a", 0)]
+
+
+def test_failed_try_counts_one_attempt(tmp_path):
+    def extractor(interviews):
+        raise ConnectionError("sin conexión")
+
+    queue = _queue(tmp_path, extractor)
+    queue._stop.wait = lambda timeout=None: False  # sin esperas entre reintentos
+    queue.enqueue("b")
+
+    assert queue.process_once(force=True) == 0
+    [job] = queue.pending_jobs()
+    assert job["attempts"] == 1
+    assert "sin conexión" in job["error"]
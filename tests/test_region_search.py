@@ -0,0 +1,27 @@
+# tests/test_region_search.py
+
+from utils.region_search import RegionSearchIndex
+
+
+def _index(n: int = 40) -> RegionSearchIndex:
+    return RegionSearchIndex(
+        [f"{i:05d}" for i in range(n)],
+        [f"REGION {i:02d}" for i in range(n)],
+    )
+
+
+def test_empty_query_offers_recent_and_first_regions_only():
+    index = _index()
+
+    options = index.filter_options("", keep=["REGION 39"], recent=["REGION 30", "REGION 39"], browse_limit=5)
+
+    assert options == ["REGION 39", "REGION 30", "REGION 00", "REGION 01", "REGION 02", "REGION 03", "REGION 04"]
+
+
+def test_search_keeps_selected_regions():
+    index = _index()
+
+    options = index.filter_options("region 1", keep=["REGION 25"])
+
+    assert options[0] == "REGION 25"
+    assert "REGION 12" in options
@@ -0,0 +1,47 @@
+# tests/test_similarity.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.similarity import SIMILARITY_METRICS, combined_distance_matrix, most_similar
+
+
+def _indicator(codes, rows) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["2020", "2021", "2022", "2023"])
+    df.insert(0, "Comarca", [f"C{code}" for code in codes])
+    df.insert(0, "Codigo comarca", codes)
+    return df
+
+
+@pytest.mark.parametrize("metric", SIMILARITY_METRICS.values())
+def test_region_without_data_has_no_similar_regions(metric):
+    df = _indicator(
+        [1100, 1200, 1300, 1400],
+        [
+            [1.0, 2.0, 3.0, 4.0],
+            [1.5, 2.5, 3.0, 4.5],
+            [9.0, 7.0, 4.0, 1.0],
+            [np.nan, np.nan, np.nan, np.nan],
+        ],
+    )
+    codes, dist = combined_distance_matrix([df], metric)
+
+    assert np.isnan(dist[codes.get_loc("01400")]).all()
+    assert most_similar(codes, dist, "01400", k=3).empty
+    # Y no aparece como similar a ninguna otra
+    assert "01400" not in most_similar(codes, dist, "01100", k=3)["id_region"].tolist()
+
+
+def test_distance_uses_only_shared_years():
+    df = _indicator(
+        [1100, 1200, 1300],
+        [
+            [1.0, 2.0, 3.0, 4.0],
+            [1.0, 2.0, np.nan, np.nan],
+            [4.0, 3.0, 2.0, 1.0],
+        ],
+    )
+    codes, dist = combined_distance_matrix([df], "euclidean")
+    # 01200 coincide con 01100 en los dos años que tiene: es la más parecida
+    assert most_similar(codes, dist, "01200", k=1)["id_region"].tolist() == ["01100"]
@@ -0,0 +1,54 @@
+# tests/test_spatial_stats.py
+
+import numpy as np
+
+from utils.spatial_stats import SparseWeights, moran_local, moran_global, lisa_cluster_labels
+
+
+def _grid_weights(side: int) -> SparseWeights:
+    """
+    Contigüidad tipo torre en una rejilla side × side.
+    """
+    rows, cols = [], []
+    for r in range(side):
+        for c in range(side):
+            i = r * side + c
+            for dr, dc in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                rr, cc = r + dr, c + dc
+                if 0 <= rr < side and 0 <= cc < side:
+                    rows.append(i)
+                    cols.append(rr * side + cc)
+    ids = [f"{i:05d}" for i in range(side * side)]
+    return SparseWeights(ids, np.array(rows), np.array(cols))
+
+
+def test_regions_without_data_are_not_significant():
+    weights = _grid_weights(6)
+    # Gradiente fuerte (mucha autocorrelación) con dos regiones sin dato en el año 0
+    values = np.add.outer(np.arange(6.0), np.arange(6.0)).reshape(-1, 1).repeat(2, axis=1)
+    values[[0, 35], 0] = np.nan
+
+    local_i, p_sim, quadrant = moran_local(weights, values, permutations=199)
+    assert np.isnan(local_i[[0, 35], 0]).all()
+    assert np.isnan(p_sim[[0, 35], 0]).all()
+    # El otro año está completo: las esquinas sí son significativas
+    assert (p_sim[[0, 35], 1] <= 0.05).all()
+
+    missing = np.isnan(values)
+    labels = lisa_cluster_labels(p_sim, quadrant, weights.islands, 0.05, missing)
+    assert list(labels[[0, 35], 0]) == ["Sin datos", "Sin datos"]
+    assert labels[0, 1] == "Bajo-Bajo"
+
+    global_df = moran_global(weights, values, permutations=199)
+    assert np.isfinite(global_df["I"]).all()
+
+
+def test_missing_values_do_not_act_as_neighbours():
+    weights = _grid_weights(4)
+    values = np.arange(16.0).reshape(-1, 1)
+    values[5, 0] = np.nan
+
+    sub = weights.subset(~np.isnan(values[:, 0]))
+    assert sub.n == 15
+    # La región 1 tenía como vecinas 0, 2 y 5; sin la 5 le quedan dos
+    assert sub.cardinalities[1] == 2
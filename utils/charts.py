@@ -0,0 +1,246 @@
+# utils/charts.py
+
+import json
+
+import numpy as np
+import pandas as pd
+
+# plotly.express se importa dentro de cada función: es la dependencia más pesada
+# de las páginas y así el título y los controles se muestran antes.
+
+
+def to_long_format(gdf_merged, year_columns: list, comarcas: list = None, year_as_int: bool = False) -> pd.DataFrame:
+    """
+    Pasa los datos de formato ancho (una columna por año) a formato largo con
+    columnas 'COMARCA', 'Año' y 'Valor'. Si se indica `comarcas`, solo se
+    conservan esas y en ese orden (la comarca aparece una vez en gdf_merged).
+    """
+    df = pd.DataFrame(gdf_merged[["COMARCA"] + list(year_columns)])
+    if comarcas is not None:
+        df = df.drop_duplicates(subset="COMARCA").set_index("COMARCA")
+        df = df.loc[[c for c in comarcas if c in df.index]].reset_index()
+
+    df_long = df.melt(id_vars="COMARCA", var_name="Año", value_name="Valor")
+    if year_as_int:
+        df_long["Año"] = df_long["Año"].astype(int)
+    return df_long
+
+
+def geometry_geojson(gdf) -> dict:
+    """
+    GeoJSON con solo la geometría y 'id_region' (lo único que necesita el mapa
+    para enlazar cada polígono con su fila). Al no depender de los valores, se
+    puede calcular una vez y reutilizar para todos los años e indicadores.
+    """
+    return json.loads(gdf[["id_region", "geometry"]].to_json())
+
+
+def build_map_figure(gdf_merged, selected_year: str, colorbar_title: str, color_args: dict = None, geojson_data: dict = None):
+    """
+    Crea el mapa de coropletas de Plotly para el año seleccionado.
+    `color_args` permite sustituir la escala continua por defecto (clases, LISA, ...).
+    `geojson_data` permite reutilizar un GeoJSON ya calculado con geometry_geojson.
+    """
+    import plotly.express as px
+
+    if color_args is None:
+        color_args = dict(color=selected_year, color_continuous_scale="YlGnBu")
+
+    # Calcular centro del mapa
+    bounds = gdf_merged.total_bounds
+    center_lat = (bounds[1] + bounds[3]) / 2
+    center_lon = (bounds[0] + bounds[2]) / 2
+
+    # Convertir GeoDataFrame a GeoJSON
+    if geojson_data is None:
+        geojson_data = geometry_geojson(gdf_merged)
+
+    fig = px.choropleth_mapbox(
+        data_frame=gdf_merged,
+        geojson=geojson_data,
+        locations="id_region",
+        featureidkey="properties.id_region",
+        hover_name="COMARCA",
+        hover_data={selected_year: True},
+        mapbox_style="carto-positron",
+        zoom=7.5,
+        center={"lat": center_lat, "lon": center_lon},
+        opacity=0.7,
+        **color_args
+    )
+
+    fig.update_layout(
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        coloraxis_colorbar=dict(title=colorbar_title)
+    )
+    return fig
+
+
+def build_raster_map_figure(gdf_merged, selected_year: str, colorbar_title: str, image_uri: str,
+                            corners: list, click_ids, click_lon, click_lat, legend: dict = None):
+    """
+    Mapa con la coropleta ya rasterizada en el servidor (`image_uri`, ver
+    utils/rasterize.py) como capa de imagen de Mapbox. El navegador solo pinta
+    una imagen, aunque haya miles de polígonos.
+
+    Para los clics y el hover se añade una traza de puntos casi invisibles (uno
+    por polígono, con su id_region en customdata), de modo que la consulta se
+    sigue haciendo sobre los datos vectoriales. `legend` (etiqueta -> color)
+    sustituye la barra de color continua por una leyenda de categorías.
+    """
+    import plotly.graph_objects as go
+
+    bounds = gdf_merged.total_bounds
+    center_lat = (bounds[1] + bounds[3]) / 2
+    center_lon = (bounds[0] + bounds[2]) / 2
+
+    info = gdf_merged.drop_duplicates(subset="id_region").set_index("id_region")
+    names = info["COMARCA"].reindex(click_ids).fillna("").to_numpy()
+    values = info[selected_year].reindex(click_ids).to_numpy(dtype=float)
+
+    marker = dict(size=14, opacity=0.01)
+    if legend is None:
+        # La barra de color se toma de esta traza (los puntos no se ven)
+        marker.update(color=values, colorscale="YlGnBu", showscale=True,
+                      colorbar=dict(title=colorbar_title))
+
+    fig = go.Figure(go.Scattermapbox(
+        lon=click_lon,
+        lat=click_lat,
+        mode="markers",
+        marker=marker,
+        customdata=np.asarray(click_ids)[:, None],
+        text=names,
+        hovertemplate="<b>%{text}</b><br>" + f"{selected_year}: " + "%{marker.color:.2f}<extra></extra>"
+        if legend is None else "<b>%{text}</b><extra></extra>",
+        showlegend=False,
+    ))
+    for label, color in (legend or {}).items():
+        # Trazas vacías solo para la leyenda
+        fig.add_trace(go.Scattermapbox(
+            lon=[None], lat=[None], mode="markers",
+            marker=dict(size=12, color=color), name=label
+        ))
+
+    fig.update_layout(
+        mapbox=dict(
+            style="carto-positron",
+            zoom=7.5,
+            center={"lat": center_lat, "lon": center_lon},
+            layers=[dict(sourcetype="image", source=image_uri, coordinates=corners, opacity=0.7, below="traces")],
+        ),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+    )
+    return fig
+
+
+def region_id_from_click(fig, point: dict) -> str:
+    """
+    id_region del elemento pulsado, tanto en el mapa vectorial (con una traza
+    por categoría, el id está en `locations`) como en el ráster (en customdata).
+    """
+    trace = fig.data[point["curveNumber"]]
+    if getattr(trace, "locations", None) is not None:
+        return trace.locations[point["pointIndex"]]
+    return trace.customdata[point["pointIndex"]][0]
+
+
+def build_bar_figure(df_plot: pd.DataFrame, label: str):
+    """
+    Histograma (barras agrupadas) de la evolución por año de cada comarca.
+    """
+    import plotly.express as px
+
+    fig = px.bar(
+        df_plot,
+        x="Año",
+        y="Valor",
+        color="COMARCA",
+        barmode="group",
+        title="Evolución de valores por comarca",
+        template="plotly_white",
+        labels={"Valor": label},
+        text="Valor"  # Para que muestre el valor encima de cada barra
+    )
+    fig.update_layout(
+        autosize=False,
+        width=1500,  # Ajusta el ancho del gráfico
+        height=600   # Ajusta la altura del gráfico si es necesario
+    )
+    # Ajustamos la posición del texto
+    fig.update_traces(textposition="outside")
+    return fig
+
+
+def build_bubble_figure(df_filtrado: pd.DataFrame, label: str):
+    """
+    Bubble chart: x = Año, y = Valor, color = COMARCA, tamaño = |Valor|.
+    """
+    import plotly.express as px
+
+    df_filtrado = df_filtrado.copy()
+    # El tamaño de burbuja no admite negativos (p.ej. variaciones o puntuaciones z)
+    df_filtrado["Tamaño"] = df_filtrado["Valor"].abs().fillna(0)
+
+    fig = px.scatter(
+        df_filtrado,
+        x="Año",
+        y="Valor",
+        color="COMARCA",
+        size="Tamaño",
+        hover_data={"COMARCA": True, "Tamaño": False},
+        title=f"Bubble Chart: {label}",
+        labels={"Valor": label},
+        height=600
+    )
+    # Ajustes opcionales
+    fig.update_layout(
+        xaxis=dict(tickmode="linear"),  # Para que muestre todos los años en secuencia
+        margin={"r":20,"t":40,"l":40,"b":20}
+    )
+    return fig
+
+
+def add_trend_lines(fig, df_trend: pd.DataFrame, year_as_str: bool = False):
+    """
+    Añade a una figura una línea discontinua por comarca con su tendencia
+    (salida de trends.trend_long_format). Con `year_as_str` el eje X es de
+    categorías (histograma): se fija el orden para que los años proyectados
+    queden junto a los demás, en el mismo orden descendente que las columnas.
+    """
+    for comarca, sub in df_trend.groupby("COMARCA", sort=False):
+        fig.add_scatter(
+            x=sub["Año"].astype(str) if year_as_str else sub["Año"],
+            y=sub["Tendencia"],
+            mode="lines",
+            line=dict(dash="dash"),
+            name=f"Tendencia {comarca}",
+        )
+    if year_as_str:
+        categories = {str(x) for trace in fig.data for x in trace.x}
+        fig.update_xaxes(categoryorder="array", categoryarray=sorted(categories, reverse=True))
+    return fig
+
+
+def build_pie_figure(df_pie: pd.DataFrame, label: str, selected_year: str):
+    """
+    Diagrama de queso con la distribución del indicador entre comarcas.
+    """
+    import plotly.express as px
+
+    return px.pie(
+        df_pie,
+        names="COMARCA",
+        values="Valor",
+        title=f"Distribución de {label} en {selected_year}",
+        hole=0.0  # 0 para un pie clásico; >0 para un donut
+    )
+
+
+def discrete_palette(n: int, scale: str = "YlGnBu") -> list:
+    """
+    n colores equiespaciados de una escala continua de Plotly.
+    """
+    import plotly.express as px
+
+    return px.colors.sample_colorscale(scale, [i / max(n - 1, 1) for i in range(n)])
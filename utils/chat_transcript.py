@@ -0,0 +1,92 @@
+# utils/chat_transcript.py
+
+import html
+
+import streamlit as st
+
+# Mensajes por bloque: cada bloque se envía como un único elemento markdown
+CHUNK_SIZE = 8
+# Bloques visibles al abrir la página (los más recientes)
+VISIBLE_CHUNKS = 2
+
+BUBBLE_CLASSES = {
+    "assistant": "assistant-bubble",
+    "user": "user-bubble",
+}
+
+
+def message_html(role: str, content: str) -> str:
+    """
+    HTML de la burbuja de un mensaje. El texto se escapa (lo escribe el
+    usuario o el modelo) y los saltos de línea se mantienen.
+    """
+    text = html.escape(content).replace("\n", "<br>")
+    return f'<div class="chat-bubble {BUBBLE_CLASSES.get(role, "assistant-bubble")}">{text}</div>'
+
+
+def _chunk_html(messages: tuple, cache: dict, position: int) -> str:
+    """
+    HTML de un bloque. Se guarda en `cache` (del st.session_state de la
+    sesión, no compartido entre usuarios) por posición, y se reutiliza
+    mientras el bloque no cambie.
+    """
+    cached = cache.get(position)
+    if cached is None or cached[0] != messages:
+        cached = (messages, "".join(message_html(role, content) for role, content in messages))
+        cache[position] = cached
+    return cached[1]
+
+
+def transcript_chunks(conversation_history: list) -> list:
+    """
+    Mensajes visibles (sin los de sistema) agrupados en bloques de CHUNK_SIZE.
+    Los bloques se cortan por posición absoluta, así que un bloque completo ya
+    no cambia: su HTML se reutiliza y el elemento es idéntico en cada
+    ejecución; solo crece el último.
+    """
+    messages = [
+        (msg["role"], msg["content"])
+        for msg in conversation_history
+        if msg["role"] != "system"
+    ]
+    return [tuple(messages[i:i + CHUNK_SIZE]) for i in range(0, len(messages), CHUNK_SIZE)]
+
+
+def _show_earlier(state_key: str):
+    st.session_state[state_key] = st.session_state.get(state_key, VISIBLE_CHUNKS) + VISIBLE_CHUNKS
+
+
+def render_transcript(conversation_history: list, state_key: str = "chat_visible_chunks"):
+    """
+    Dibuja la conversación por ventanas: solo los VISIBLE_CHUNKS bloques más
+    recientes, con un botón "Cargar anteriores" que amplía la ventana
+    (st.session_state[state_key]). El coste de cada ejecución depende del
+    tamaño de la ventana, no de la longitud de la entrevista.
+    El HTML de los bloques se guarda en st.session_state[f"{state_key}_html"],
+    así que vive y se libera con la sesión del usuario.
+    """
+    chunks = transcript_chunks(conversation_history)
+    html_cache = st.session_state.setdefault(f"{state_key}_html", {})
+    n_visible = st.session_state.get(state_key, VISIBLE_CHUNKS)
+    hidden = chunks[:-n_visible] if n_visible < len(chunks) else []
+
+    if hidden:
+        n_hidden = sum(len(chunk) for chunk in hidden)
+        st.button(
+            f"Cargar anteriores ({n_hidden} mensajes)",
+            key=f"{state_key}_earlier",
+            on_click=_show_earlier,
+            args=(state_key,)
+        )
+
+    for position in range(len(hidden), len(chunks)):
+        chunk_html = _chunk_html(chunks[position], html_cache, position)
+        st.markdown(f'<div class="chat-box">{chunk_html}</div>', unsafe_allow_html=True)
+
+
+def reset_transcript(state_key: str = "chat_visible_chunks"):
+    """
+    Vuelve a la ventana inicial (p.ej. al reiniciar la entrevista).
+    """
+    st.session_state.pop(state_key, None)
+    st.session_state.pop(f"{state_key}_html", None)
@@ -0,0 +1,208 @@
+# utils/classification.py
+
+import numpy as np
+import streamlit as st
+
+CLASSIFICATION_SCHEMES = {
+    "Continua": None,
+    "Cuantiles": "quantiles",
+    "Intervalos iguales": "equal_interval",
+    "Jenks (cortes naturales)": "jenks",
+}
+
+
+def quantile_breaks(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Cortes por cuantiles para todas las columnas (años) de `values` a la vez.
+    Devuelve una matriz (años, k+1) con el mínimo, los k-1 cortes y el máximo.
+    """
+    with np.errstate(invalid="ignore"):
+        return np.nanquantile(values, np.linspace(0.0, 1.0, k + 1), axis=0).T
+
+
+def distinct_counts(values: np.ndarray) -> np.ndarray:
+    """
+    Número de valores distintos (sin NaN) de cada columna.
+    """
+    ordered = np.sort(values, axis=0)
+    changes = (np.diff(ordered, axis=0) > 0).sum(axis=0)
+    return np.where(np.isfinite(ordered).any(axis=0), changes + 1, 0)
+
+
+def equal_interval_breaks(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Cortes en intervalos de igual amplitud para todas las columnas a la vez.
+    Las columnas con menos de k valores distintos se dividen en tantos
+    intervalos como valores tienen (el resto de la fila queda en NaN).
+    """
+    with np.errstate(invalid="ignore"):
+        vmin = np.nanmin(values, axis=0)
+        vmax = np.nanmax(values, axis=0)
+    k_per_col = np.clip(distinct_counts(values), 1, k)
+    step = np.arange(k + 1)
+    steps = np.where(step[None, :] <= k_per_col[:, None], step[None, :] / k_per_col[:, None], np.nan)
+    return vmin[:, None] + (vmax - vmin)[:, None] * steps
+
+
+def _jenks_layer(prev, s1, s2, x_off, p_off, n_per_col, active, m):
+    """
+    Calcula una fila de la programación dinámica de Fisher-Jenks para todas las
+    columnas activas a la vez: cost[j] = min_i prev[i-1] + SSE(i..j), con i >= m.
+    Como el índice óptimo i es monótono en j, se resuelve por divide y vencerás;
+    en cada nivel se evalúan juntos (vectorizado) los candidatos de todos los
+    intervalos pendientes de todas las columnas, así que el coste es
+    O(n log n) por fila sin bucles de Python por elemento.
+    Los arrays están concatenados por columnas (x_off / p_off son los desplazamientos).
+    """
+    cost = np.full(len(prev), np.inf)
+    opt = np.zeros(len(prev), dtype=np.int64)
+
+    col = np.asarray(active, dtype=np.int64)
+    last = n_per_col[col] - 1
+    j_lo, j_hi = np.full(len(col), m), last
+    i_lo, i_hi = np.full(len(col), m), last.copy()
+
+    while len(col):
+        j = (j_lo + j_hi) // 2
+        counts = np.minimum(i_hi, j) - i_lo + 1
+        seg = np.repeat(np.arange(len(col)), counts)
+        seg_start = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        i = i_lo[seg] + np.arange(len(seg)) - seg_start[seg]
+
+        c, jj = col[seg], j[seg]
+        p = p_off[c]
+        size = jj - i + 1
+        total = s1[p + jj + 1] - s1[p + i]
+        sse = (s2[p + jj + 1] - s2[p + i]) - total * total / size
+        candidates = prev[x_off[c] + i - 1] + sse
+
+        # Primer mínimo de cada segmento
+        seg_min = np.minimum.reduceat(candidates, seg_start)
+        hits = np.flatnonzero(candidates == seg_min[seg])
+        _, first = np.unique(seg[hits], return_index=True)
+        best = i[hits[first]]
+
+        target = x_off[col] + j
+        cost[target] = seg_min
+        opt[target] = best
+
+        # Subintervalos izquierdo y derecho
+        col = np.concatenate((col, col))
+        j_lo, j_hi = np.concatenate((j_lo, j + 1)), np.concatenate((j - 1, j_hi))
+        i_lo, i_hi = np.concatenate((i_lo, best)), np.concatenate((best, i_hi))
+        keep = j_lo <= j_hi
+        col, j_lo, j_hi, i_lo, i_hi = col[keep], j_lo[keep], j_hi[keep], i_lo[keep], i_hi[keep]
+
+    return cost, opt
+
+
+def jenks_breaks(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    Cortes naturales de Jenks (óptimo de Fisher) para cada columna (año) de
+    `values`, calculados en una única pasada para todas las columnas.
+    Devuelve (años, k+1): mínimo, límite superior de cada clase y máximo.
+    """
+    n_cols = values.shape[1]
+    columns = [np.sort(values[np.isfinite(values[:, c]), c]) for c in range(n_cols)]
+    n_per_col = np.array([len(x) for x in columns], dtype=np.int64)
+    k_per_col = np.array([min(k, len(np.unique(x))) for x in columns], dtype=np.int64)
+
+    x_all = np.concatenate(columns) if n_cols else np.array([])
+    x_off = np.concatenate(([0], np.cumsum(n_per_col)[:-1])).astype(np.int64)
+    p_off = x_off + np.arange(n_cols)
+    s1 = np.concatenate([np.concatenate(([0.0], np.cumsum(x))) for x in columns])
+    s2 = np.concatenate([np.concatenate(([0.0], np.cumsum(x * x))) for x in columns])
+
+    # Primera clase: SSE de x[0..j] en cada columna
+    pos = np.arange(len(x_all)) - np.repeat(x_off, n_per_col)
+    col_of = np.repeat(np.arange(n_cols), n_per_col)
+    total = s1[p_off[col_of] + pos + 1]
+    cost = s2[p_off[col_of] + pos + 1] - total * total / (pos + 1)
+
+    layers = []
+    for m in range(1, int(k_per_col.max(initial=0))):
+        active = np.flatnonzero(k_per_col > m)
+        cost, opt = _jenks_layer(cost, s1, s2, x_off, p_off, n_per_col, active, m)
+        layers.append(opt)
+
+    breaks = np.full((n_cols, k + 1), np.nan)
+    for c, x in enumerate(columns):
+        if len(x) == 0:
+            continue
+        upper = []
+        j = len(x) - 1
+        for m in range(k_per_col[c] - 1, 0, -1):
+            i = layers[m - 1][x_off[c] + j]
+            upper.append(x[i - 1])
+            j = i - 1
+        row = [x[0]] + upper[::-1] + [x[-1]]
+        breaks[c] = row + [x[-1]] * (k + 1 - len(row))
+    return breaks
+
+
+def jenks_breaks_1d(column: np.ndarray, k: int) -> np.ndarray:
+    """
+    Cortes de Jenks para un único vector (ver jenks_breaks).
+    """
+    return jenks_breaks(np.asarray(column, dtype=float)[:, None], k)[0]
+
+
+def unique_breaks(breaks: np.ndarray) -> np.ndarray:
+    """
+    Quita los cortes repetidos de cada año (p.ej. cuantiles de un indicador con
+    pocos valores distintos): los cortes que quedan se juntan al principio de
+    la fila y el resto se rellena con NaN, así que cada año tiene como mucho
+    tantas clases como valores distintos.
+    """
+    repeated = np.zeros(breaks.shape, dtype=bool)
+    repeated[:, 1:] = breaks[:, 1:] == breaks[:, :-1]
+    return np.sort(np.where(repeated, np.nan, breaks), axis=1)
+
+
+def assign_classes(values: np.ndarray, breaks: np.ndarray) -> np.ndarray:
+    """
+    Asigna a cada celda de `values` (regiones, años) su clase 0..k-1 según los
+    cortes de su año, en una sola operación vectorizada. Los NaN reciben -1.
+    Cada clase incluye su límite superior; los cortes NaN (ver unique_breaks)
+    no separan nada.
+    """
+    inner = breaks[:, 1:-1]
+    classes = (values[:, :, None] > inner[None, :, :]).sum(axis=2)
+    return np.where(np.isnan(values), -1, classes)
+
+
+def class_labels(breaks_row: np.ndarray, fmt: str = "{:.2f}") -> list:
+    """
+    Etiquetas legibles '[a – b]' para las clases de un año (una por clase,
+    sin contar los cortes NaN de unique_breaks).
+    """
+    cuts = breaks_row[~np.isnan(breaks_row)]
+    if len(cuts) == 1:
+        # Un único valor en todo el año: una sola clase
+        cuts = np.repeat(cuts, 2)
+    return [
+        f"{fmt.format(cuts[c])} – {fmt.format(cuts[c + 1])}"
+        for c in range(len(cuts) - 1)
+    ]
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def classify_all_years(values: np.ndarray, scheme: str, k: int):
+    """
+    Calcula cortes y clases para todos los años de un indicador en una sola
+    pasada. Se cachea por (contenido del indicador, esquema, k), de modo que
+    cambiar de año en la página no recalcula nada.
+    Devuelve (breaks, classes) con formas (años, k+1) y (regiones, años); los
+    años con menos de k valores distintos tienen menos clases (ver unique_breaks).
+    """
+    if scheme == "quantiles":
+        breaks = quantile_breaks(values, k)
+    elif scheme == "equal_interval":
+        breaks = equal_interval_breaks(values, k)
+    elif scheme == "jenks":
+        breaks = jenks_breaks(values, k)
+    else:
+        raise ValueError(f"Esquema de clasificación desconocido: {scheme}")
+
+    breaks = unique_breaks(breaks)
+    return breaks, assign_classes(values, breaks)
@@ -0,0 +1,314 @@
+# utils/data_api.py
+"""
+API de datos de solo lectura para consumidores masivos (otros equipos, scripts).
+
+La lógica está en `handle_request`, una función pura (método, ruta, cabeceras)
+-> (estado, cabeceras, cuerpo) que no depende de ningún servidor, así que se
+puede probar sin red. scripts/serve_api.py la expone por HTTP.
+
+Rutas:
+    GET /indicators                      catálogo (JSON)
+    GET /indicators/<slug>.arrow         tabla comarca × año en Arrow IPC (stream)
+    GET /indicators/<slug>.parquet       la misma tabla en Parquet
+    GET /indicators/<slug>.geojson       la tabla con geometría simplificada
+    GET /geometry.geojson                solo la geometría simplificada
+
+Parámetros:
+    columns=2020,2021      proyección de columnas (id_region se incluye siempre)
+    regions=01100,01200    proyección de filas por código de comarca
+    simplify=25            tolerancia de simplificación en metros (solo GeoJSON)
+
+Cada respuesta lleva un ETag calculado a partir de las versiones (hash de
+contenido) de los ficheros de origen, la definición del indicador, el código
+que lo transforma y los parámetros, sin generar el
+cuerpo: una petición con If-None-Match vigente se responde con 304 al momento.
+Con Accept-Encoding se comprime en zstd (códec de pyarrow) o gzip.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import load_shapefile, data_version
+from utils.indicators import list_indicators, load_indicator, indicator_sources, indicator_slug, indicator_version
+from utils.derived_indicators import DERIVED_INDICATORS
+from utils.geoutils import prepare_geodata, detect_year_columns, convert_year_to_numeric
+
+SHP_PATH = "data/COMARCAS_5000_ETRS89.shp"
+KEY_COLUMNS = ["id_region", "COMARCA", "COMARC_EUS"]
+DEFAULT_SIMPLIFY = 25.0
+MAX_SIMPLIFY = 1000.0
+# Por debajo de este tamaño no compensa comprimir
+MIN_COMPRESS_BYTES = 1024
+
+CONTENT_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "geojson": "application/geo+json",
+    "json": "application/json",
+}
+# Parquet ya va comprimido por columnas
+COMPRESSIBLE = {"arrow", "geojson", "json"}
+
+# Código que determina el contenido de las respuestas (como en scripts/export_report.py)
+CODE_DEPENDENCIES = [
+    "data_api.py",
+    "derived_indicators.py",
+    "geoutils.py",
+    "indicators.py",
+]
+
+
+def _code_hash() -> str:
+    """
+    Hash del código cargado: si cambian las transformaciones, cambian los ETag.
+    """
+    digest = hashlib.sha256()
+    for name in CODE_DEPENDENCIES:
+        with open(os.path.join(os.path.dirname(__file__), name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+CODE_HASH = _code_hash()
+
+
+class ApiError(Exception):
+    """
+    Error de la petición, con su código HTTP.
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ----------------------------------------------------------------------------
+# Datos
+# ----------------------------------------------------------------------------
+
+def _indicators_by_slug() -> dict:
+    return {indicator_slug(name): name for name in list_indicators()}
+
+
+def _versions(name: str = None) -> tuple:
+    """
+    Versiones de todo lo que interviene en una respuesta: contenido de los
+    ficheros de origen, definición del indicador derivado y código.
+    """
+    sources = indicator_sources(name) if name else []
+    spec = json.dumps(DERIVED_INDICATORS.get(name), sort_keys=True)
+    return tuple(data_version(path) for path in sources + [SHP_PATH]) + (spec, CODE_HASH)
+
+
+def _merged_geodata(name: str, simplify: float = 0.0):
+    """
+    Merge shapefile + indicador igual que en las páginas (años ya numéricos).
+    Sin indicador, solo la geometría con las columnas clave.
+    """
+    gdf = load_shapefile(SHP_PATH)
+    if simplify > 0:
+        # Tolerancia en metros: el shapefile está en un CRS proyectado (ETRS89 / UTM)
+        gdf["geometry"] = gdf.geometry.simplify(simplify, preserve_topology=True)
+
+    if name is None:
+        gdf_merged = prepare_geodata(
+            gdf, pd.DataFrame({"Codigo comarca": pd.Series(dtype=str)}), versions=(data_version(SHP_PATH), ())
+        )
+        return gdf_merged[KEY_COLUMNS + ["geometry"]], []
+
+    gdf_merged = prepare_geodata(gdf, load_indicator(name), versions=(data_version(SHP_PATH), indicator_version(name)))
+    year_columns = detect_year_columns(gdf_merged)
+    for col in year_columns:
+        gdf_merged = convert_year_to_numeric(gdf_merged, col)
+    return gdf_merged[KEY_COLUMNS + year_columns + ["geometry"]], year_columns
+
+
+def _project(frame, columns: tuple, regions: tuple):
+    """
+    Proyección de filas (códigos de comarca) y de columnas.
+    """
+    if regions:
+        frame = frame[frame["id_region"].isin(regions)]
+    if columns:
+        unknown = [col for col in columns if col not in frame.columns]
+        if unknown:
+            raise ApiError(400, f"Columnas desconocidas: {', '.join(unknown)}")
+        keep = ["id_region"] + [col for col in columns if col != "id_region"]
+        if "geometry" in frame.columns:
+            keep.append("geometry")
+        frame = frame[keep]
+    return frame
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _render_body(name: str, fmt: str, versions: tuple, columns: tuple, regions: tuple,
+                 simplify: float) -> bytes:
+    """
+    Genera (y cachea por versión de los datos y parámetros) el cuerpo sin comprimir.
+    """
+    gdf_merged, _ = _merged_geodata(name, simplify if fmt == "geojson" else 0.0)
+    gdf_merged = _project(gdf_merged, columns, regions)
+
+    if fmt == "geojson":
+        return gdf_merged.to_json(na="null", drop_id=True).encode("utf-8")
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(pd.DataFrame(gdf_merged.drop(columns="geometry")), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        import pyarrow as pa
+
+        return pa.compress(body, codec="zstd", asbytes=True)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _catalog() -> bytes:
+    items = []
+    for slug, name in _indicators_by_slug().items():
+        items.append({
+            "name": name,
+            "slug": slug,
+            "urls": {fmt: f"/indicators/{slug}.{fmt}" for fmt in ("arrow", "parquet", "geojson")},
+        })
+    return json.dumps({"indicators": items, "geometry": "/geometry.geojson"}, ensure_ascii=False).encode("utf-8")
+
+
+# ----------------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------------
+
+def _zstd_available() -> bool:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return False
+    return pa.Codec.is_available("zstd")
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    """
+    Codificación preferida según Accept-Encoding: zstd, gzip o identity.
+    """
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        token, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        accepted.add(token.strip().lower())
+    if "zstd" in accepted and _zstd_available():
+        return "zstd"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def _list_param(query: dict, key: str) -> tuple:
+    values = []
+    for raw in query.get(key, []):
+        values += [item.strip() for item in raw.split(",") if item.strip()]
+    return tuple(values)
+
+
+def _etag(*parts) -> str:
+    return '"' + hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+
+def _json_error(status: int, message: str):
+    body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+    return status, {"Content-Type": CONTENT_TYPES["json"], "Content-Length": str(len(body))}, body
+
+
+def handle_request(method: str, target: str, headers: dict = None):
+    """
+    Atiende una petición. `target` es la ruta con su query string y `headers`
+    las cabeceras de la petición (sin distinguir mayúsculas).
+    Devuelve (código de estado, cabeceras de respuesta, cuerpo en bytes).
+    """
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    if method not in ("GET", "HEAD"):
+        status, response_headers, body = _json_error(405, "Solo se admiten GET y HEAD")
+        response_headers["Allow"] = "GET, HEAD"
+        return status, response_headers, body
+
+    url = urlsplit(target)
+    query = parse_qs(url.query)
+    path = url.path.rstrip("/") or "/"
+
+    try:
+        if path in ("/", "/indicators"):
+            name, fmt = None, "json"
+        elif path == "/geometry.geojson":
+            name, fmt = None, "geojson"
+        elif path.startswith("/indicators/"):
+            slug, _, fmt = path[len("/indicators/"):].rpartition(".")
+            name = _indicators_by_slug().get(slug)
+            if name is None:
+                raise ApiError(404, f"Indicador desconocido: {slug}")
+            if fmt not in ("arrow", "parquet", "geojson"):
+                raise ApiError(404, f"Formato no soportado: {fmt}")
+        else:
+            raise ApiError(404, f"Ruta desconocida: {path}")
+
+        columns = _list_param(query, "columns")
+        regions = tuple(code.zfill(5) for code in _list_param(query, "regions"))
+        try:
+            simplify = float(query.get("simplify", [DEFAULT_SIMPLIFY])[0])
+        except ValueError:
+            raise ApiError(400, "simplify debe ser un número (metros)")
+        if not 0 <= simplify <= MAX_SIMPLIFY:
+            raise ApiError(400, f"simplify debe estar entre 0 y {MAX_SIMPLIFY:g} metros")
+        if fmt != "geojson":
+            simplify = 0.0
+
+        encoding = choose_encoding(headers.get("accept-encoding", "")) if fmt in COMPRESSIBLE else "identity"
+        versions = _versions(name) if fmt != "json" else tuple(list_indicators()) + (CODE_HASH,)
+        etag = _etag(path, fmt, versions, columns, regions, simplify, encoding)
+
+        response_headers = {
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(headers.get("if-none-match", ""), etag):
+            return 304, response_headers, b""
+
+        body = _catalog() if fmt == "json" else _render_body(name, fmt, versions, columns, regions, simplify)
+        if encoding != "identity" and len(body) >= MIN_COMPRESS_BYTES:
+            body = _compress(body, encoding)
+            response_headers["Content-Encoding"] = encoding
+        response_headers["Content-Type"] = CONTENT_TYPES[fmt]
+        response_headers["Content-Length"] = str(len(body))
+        return 200, response_headers, (b"" if method == "HEAD" else body)
+
+    except ApiError as e:
+        return _json_error(e.status, str(e))
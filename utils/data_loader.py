@@ -1,19 +1,83 @@
 # utils/data_loader.py
 
+from typing import TYPE_CHECKING
+
 import streamlit as st
-import geopandas as gpd
 import pandas as pd
 
-@st.cache_data
-def load_shapefile(shp_path: str) -> gpd.GeoDataFrame:
+from utils.data_watcher import DataWatcher
+from utils.geoutils import normalize_region_codes
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+DATA_DIR = "data"
+
+# Versiones antiguas de cada fichero que se conservan en caché tras una recarga
+MAX_CACHED_VERSIONS = 32
+
+
+@st.cache_data(max_entries=MAX_CACHED_VERSIONS, show_spinner=False)
+def _read_shapefile(shp_path: str, version: str) -> "gpd.GeoDataFrame":
+    import geopandas as gpd
+
+    gdf = gpd.read_file(shp_path)
+    # Códigos de región a 5 dígitos una vez por versión (ver geoutils.prepare_geodata)
+    if "id_region" in gdf.columns:
+        gdf["id_region"] = normalize_region_codes(gdf["id_region"])
+    return gdf
+
+
+@st.cache_data(max_entries=MAX_CACHED_VERSIONS, show_spinner=False)
+def _read_csv(csv_path: str, version: str) -> pd.DataFrame:
+    df = pd.read_csv(csv_path, sep=';', encoding='utf-8')
+    # Nombres de comarca como categóricos (diccionario + códigos enteros):
+    # se codifican una vez por versión y el join de prepare_geodata solo copia enteros
+    if "Comarca" in df.columns:
+        df["Comarca"] = df["Comarca"].astype("category")
+    return df
+
+
+def _warm_dataset(path: str, version: str):
+    """
+    Recarga un conjunto de datos cambiado en la caché antes de publicar su
+    nueva versión (se ejecuta en el hilo del vigilante).
+    """
+    if path.endswith(".shp"):
+        _read_shapefile(path, version)
+    elif path.endswith(".csv"):
+        _read_csv(path, version)
+
+
+@st.cache_resource
+def get_data_watcher() -> DataWatcher:
+    """
+    Vigilante único por proceso servidor de la carpeta data/, ya arrancado.
+    """
+    watcher = DataWatcher(DATA_DIR, warm=_warm_dataset)
+    watcher.start()
+    return watcher
+
+
+def data_version(path: str) -> str:
+    """
+    Versión (hash de contenido) publicada de un fichero de datos. Forma parte de
+    la clave de caché de todo lo que se calcula a partir de ese fichero, así que
+    al cambiar el fichero solo se recalcula lo que depende de él.
+    """
+    return get_data_watcher().version(path)
+
+
+def load_shapefile(shp_path: str) -> "gpd.GeoDataFrame":
     """
     Carga un Shapefile y devuelve un GeoDataFrame.
+    geopandas (y GDAL/pyproj) se importan aquí, solo en las páginas que usan geometría.
     """
-    return gpd.read_file(shp_path)
+    return _read_shapefile(shp_path, data_version(shp_path))
+
 
-@st.cache_data
 def load_csv(csv_path: str) -> pd.DataFrame:
     """
     Carga un CSV con separador ; y encoding UTF-8.
     """
-    return pd.read_csv(csv_path, sep=';', encoding='utf-8')
+    return _read_csv(csv_path, data_version(csv_path))
@@ -0,0 +1,189 @@
+# utils/data_watcher.py
+
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ficheros auxiliares que forman un mismo conjunto de datos con su .shp
+SHAPEFILE_PARTS = {".shp", ".shx", ".dbf", ".prj", ".cpg"}
+WATCHED_EXTENSIONS = {".csv"} | SHAPEFILE_PARTS
+
+
+def file_hash(path: str) -> str:
+    """
+    SHA-256 del contenido de un fichero.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_path(path: str) -> str:
+    """
+    Conjunto de datos al que pertenece un fichero: los auxiliares de un
+    shapefile (.dbf, .shx, ...) se agrupan bajo su .shp.
+    """
+    stem, ext = os.path.splitext(os.path.normpath(path))
+    return stem + ".shp" if ext.lower() in SHAPEFILE_PARTS else stem + ext
+
+
+class DataWatcher:
+    """
+    Vigila una carpeta de datos y publica una "versión" (hash de contenido) por
+    conjunto de datos (cada CSV, cada shapefile con sus auxiliares).
+
+    - Cada `interval` segundos compara tamaño y fecha de modificación; solo se
+      calcula el hash de los ficheros cuyo stat ha cambiado.
+    - Un fichero modificado se ignora hasta que su stat se mantiene igual entre
+      dos pasadas (así no se lee un CSV a medio copiar).
+    - Antes de publicar las nuevas versiones se llama a `warm(dataset, version)`
+      para cada conjunto cambiado, de modo que la recarga ocurre en este hilo y
+      no en la petición de un usuario. Si falla, se mantiene la versión anterior.
+    - La publicación es un único cambio de referencia del diccionario de
+      versiones: cada ejecución de una página ve el estado anterior o el nuevo,
+      nunca una mezcla.
+    """
+    def __init__(self, data_dir: str, interval: float = 5.0, warm=None):
+        self.data_dir = os.path.normpath(data_dir)
+        self.interval = interval
+        self.warm = warm
+
+        self._stats = {}     # fichero -> (mtime_ns, size) de la última pasada
+        self._hashes = {}    # fichero -> hash de contenido
+        self._hashed_stats = {}  # fichero -> stat con el que se calculó su hash
+        self._versions = {}  # conjunto de datos -> versión publicada
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_refresh = None
+        self.last_changes = []
+
+        # Primera pasada síncrona: todo lo que hay en disco se publica sin esperar
+        stats = self._scan()
+        self._stats = stats
+        self._hashes = {path: file_hash(path) for path in stats}
+        self._hashed_stats = dict(stats)
+        self._versions = self._build_versions(self._hashes)
+
+    def _scan(self) -> dict:
+        stats = {}
+        with os.scandir(self.data_dir) as entries:
+            for entry in entries:
+                ext = os.path.splitext(entry.name)[1].lower()
+                if entry.is_file() and ext in WATCHED_EXTENSIONS:
+                    st_result = entry.stat()
+                    stats[os.path.join(self.data_dir, entry.name)] = (st_result.st_mtime_ns, st_result.st_size)
+        return stats
+
+    @staticmethod
+    def _build_versions(hashes: dict) -> dict:
+        parts = {}
+        for path in sorted(hashes):
+            parts.setdefault(dataset_path(path), []).append(hashes[path])
+        return {
+            dataset: parts_hashes[0] if len(parts_hashes) == 1
+            else hashlib.sha256("".join(parts_hashes).encode()).hexdigest()
+            for dataset, parts_hashes in parts.items()
+        }
+
+    def version(self, path: str) -> str:
+        """
+        Versión publicada del conjunto de datos de `path` ('' si no existe).
+        Las rutas fuera de la carpeta vigilada se resuelven con su hash actual.
+        """
+        dataset = dataset_path(path)
+        versions = self._versions
+        if dataset in versions:
+            return versions[dataset]
+        if os.path.dirname(dataset) == self.data_dir or not os.path.exists(path):
+            return ""
+        return file_hash(path)
+
+    def versions(self) -> dict:
+        """
+        Copia de las versiones publicadas {conjunto de datos: hash}.
+        """
+        return dict(self._versions)
+
+    def check(self) -> list:
+        """
+        Una pasada del vigilante. Devuelve los conjuntos de datos actualizados.
+        """
+        with self._lock:
+            stats = self._scan()
+            previous_stats, self._stats = self._stats, stats
+
+            hashes = {}
+            for path, stat in stats.items():
+                if stat == self._hashed_stats.get(path):
+                    hashes[path] = self._hashes[path]
+                elif stat == previous_stats.get(path):
+                    # Estable durante una pasada completa: ya se puede leer
+                    hashes[path] = file_hash(path)
+                    self._hashed_stats[path] = stat
+                elif path in self._hashes:
+                    # En escritura: se sigue usando el contenido anterior
+                    hashes[path] = self._hashes[path]
+            self._hashes = hashes
+            self._hashed_stats = {path: self._hashed_stats[path] for path in hashes if path in self._hashed_stats}
+
+            new_versions = self._build_versions(hashes)
+            changed = sorted(
+                dataset for dataset in set(new_versions) | set(self._versions)
+                if new_versions.get(dataset) != self._versions.get(dataset)
+            )
+            if not changed:
+                return []
+
+            published = dict(self._versions)
+            updated = []
+            for dataset in changed:
+                if dataset not in new_versions:
+                    published.pop(dataset, None)
+                    updated.append(dataset)
+                    continue
+                try:
+                    if self.warm is not None:
+                        self.warm(dataset, new_versions[dataset])
+                    published[dataset] = new_versions[dataset]
+                    updated.append(dataset)
+                except Exception:
+                    # Se reintentará en la siguiente pasada
+                    logger.exception("No se pudo recargar %s; se mantiene la versión anterior", dataset)
+
+            if updated:
+                self._versions = published
+                self.last_refresh = time.time()
+                self.last_changes = updated
+                logger.info("Datos actualizados: %s", ", ".join(updated))
+            return updated
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Error en el vigilante de datos")
+
+    def start(self):
+        """
+        Arranca el hilo vigilante (idempotente).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Detiene el hilo vigilante.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
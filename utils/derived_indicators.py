@@ -0,0 +1,180 @@
+# utils/derived_indicators.py
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMN = "Codigo comarca"
+NAME_COLUMN = "Comarca"
+
+# Indicadores derivados: cada entrada define una expresión sobre uno o varios
+# indicadores (base o derivados) registrados en utils/indicators.py.
+#   - op "yoy":    variación interanual (%) respecto al año anterior disponible
+#   - op "cagr":   tasa de crecimiento anual compuesto (%) en una ventana de años
+#   - op "zscore": puntuación z entre regiones para cada año
+#   - op "rank":   posición de cada región en cada año (1 = valor más alto)
+#   - op "ratio":  cociente entre dos indicadores (región a región, año a año)
+# Operaciones cuyo resultado no se puede sumar entre regiones (tasas, valores
+# con signo, posiciones o cocientes): no tienen sentido como partes de un total
+NON_ADDITIVE_OPS = {"yoy", "cagr", "zscore", "rank", "ratio"}
+
+DERIVED_INDICATORS = {
+    "Contratos Anuales - Variación interanual (%)": {
+        "op": "yoy",
+        "inputs": ["Contratos Anuales"],
+    },
+    "Población contratada año - Variación interanual (%)": {
+        "op": "yoy",
+        "inputs": ["Población contratada año"],
+    },
+    "Densidad comercial minorista - Crecimiento anual compuesto 5 años (%)": {
+        "op": "cagr",
+        "inputs": ["Densidad comercial minorista"],
+        "window": 5,
+    },
+    "Contratos Indefinidos - Puntuación z entre comarcas": {
+        "op": "zscore",
+        "inputs": ["Contratos Indefinidos"],
+    },
+    "Empleo generado microempresas - Ranking entre comarcas": {
+        "op": "rank",
+        "inputs": ["Empleo generado microempresas"],
+    },
+    "Contratos Anuales / Población contratada año": {
+        "op": "ratio",
+        "inputs": ["Contratos Anuales", "Población contratada año"],
+    },
+}
+
+
+def indicator_to_matrix(df: pd.DataFrame):
+    """
+    Convierte un indicador con formato CSV (código, nombre y una columna por año)
+    en una matriz región × año.
+    Devuelve (claves, años, valores): claves es un DataFrame con código y nombre,
+    años es la lista de columnas de año en orden ascendente y valores un ndarray float.
+    """
+    year_cols = sorted((col for col in df.columns if str(col).isdigit()), key=int)
+    values = (
+        df[year_cols]
+        .astype(str)
+        .replace(",", ".", regex=True)
+        .apply(pd.to_numeric, errors="coerce")
+        .to_numpy(dtype=float)
+    )
+    keys = df[[ID_COLUMN, NAME_COLUMN]].reset_index(drop=True)
+    return keys, [str(col) for col in year_cols], values
+
+
+def matrix_to_indicator(keys: pd.DataFrame, years: list, values: np.ndarray) -> pd.DataFrame:
+    """
+    Operación inversa a indicator_to_matrix: reconstruye un DataFrame con el mismo
+    formato que los CSV (años en orden descendente) para que las páginas lo traten
+    como un dataset más.
+    """
+    df_years = pd.DataFrame(values, columns=years).iloc[:, ::-1]
+    return pd.concat([keys.reset_index(drop=True), df_years], axis=1)
+
+
+def year_over_year(values: np.ndarray) -> np.ndarray:
+    """
+    Variación porcentual de cada año respecto a la columna anterior.
+    """
+    result = np.full_like(values, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[:, 1:] = (values[:, 1:] / values[:, :-1] - 1.0) * 100.0
+    result[~np.isfinite(result)] = np.nan
+    return result
+
+
+def compound_growth(values: np.ndarray, years: list, window: int) -> np.ndarray:
+    """
+    Tasa de crecimiento anual compuesto (%) entre cada año y el año situado
+    `window` años antes. Si ese año no existe en los datos, el resultado es NaN.
+    """
+    position = {int(year): i for i, year in enumerate(years)}
+    base_idx = np.array([position.get(int(year) - window, -1) for year in years])
+    has_base = base_idx >= 0
+
+    result = np.full_like(values, np.nan)
+    if not has_base.any():
+        return result
+
+    base = values[:, base_idx[has_base]]
+    current = values[:, has_base]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = (np.power(current / base, 1.0 / window) - 1.0) * 100.0
+    growth[~np.isfinite(growth)] = np.nan
+    result[:, has_base] = growth
+    return result
+
+
+def cross_region_zscore(values: np.ndarray) -> np.ndarray:
+    """
+    Puntuación z de cada región respecto al resto de regiones del mismo año.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        result = (values - mean) / np.where(std > 0, std, np.nan)
+    return result
+
+
+def cross_region_rank(values: np.ndarray) -> np.ndarray:
+    """
+    Ranking de cada región dentro de su año (1 = valor más alto). Los NaN se mantienen.
+    """
+    return (
+        pd.DataFrame(values)
+        .rank(axis=0, ascending=False, method="min")
+        .to_numpy(dtype=float)
+    )
+
+
+def indicator_ratio(df_num: pd.DataFrame, df_den: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cociente entre dos indicadores, alineando por código de región y año.
+    Solo se conservan los años presentes en ambos.
+    """
+    keys, years_num, num = indicator_to_matrix(df_num)
+    keys_den, years_den, den = indicator_to_matrix(df_den)
+
+    years = [year for year in years_num if year in set(years_den)]
+    col_num = [years_num.index(year) for year in years]
+    col_den = [years_den.index(year) for year in years]
+
+    row_den = pd.Index(keys_den[ID_COLUMN]).get_indexer(keys[ID_COLUMN])
+    den_aligned = np.full((len(keys), len(years)), np.nan)
+    matched = row_den >= 0
+    den_aligned[matched] = den[row_den[matched]][:, col_den]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = num[:, col_num] / den_aligned
+    ratio[~np.isfinite(ratio)] = np.nan
+    return matrix_to_indicator(keys, years, ratio)
+
+
+def compute_derived(spec: dict, base_frames: dict) -> pd.DataFrame:
+    """
+    Evalúa la expresión `spec` (ver DERIVED_INDICATORS) sobre los indicadores de
+    entrada de `base_frames` ({nombre: DataFrame}). El cálculo se hace de una vez
+    sobre toda la matriz región × año.
+    """
+    op = spec["op"]
+    inputs = [base_frames[name] for name in spec["inputs"]]
+
+    if op == "ratio":
+        return indicator_ratio(inputs[0], inputs[1])
+
+    keys, years, values = indicator_to_matrix(inputs[0])
+    if op == "yoy":
+        result = year_over_year(values)
+    elif op == "cagr":
+        result = compound_growth(values, years, int(spec.get("window", 5)))
+    elif op == "zscore":
+        result = cross_region_zscore(values)
+    elif op == "rank":
+        result = cross_region_rank(values)
+    else:
+        raise ValueError(f"Operación de indicador derivado desconocida: {op}")
+
+    return matrix_to_indicator(keys, years, result)
@@ -1,33 +1,185 @@
 # utils/geoutils.py
 
-import geopandas as gpd
+from typing import TYPE_CHECKING
+
+import numpy as np
 import pandas as pd
+import streamlit as st
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+# Clave de las filas cuyo código no es numérico (nunca casa con nada)
+INVALID_KEY = -1
+
+
+def region_keys(codes: pd.Series) -> np.ndarray:
+    """
+    Códigos de región -> claves enteras (int64): '01100', ' 1100' y 1100 dan
+    la misma clave, sin pasar por strip/zfill de cadenas. Los códigos vacíos o
+    no numéricos dan INVALID_KEY.
+    """
+    if pd.api.types.is_integer_dtype(codes):
+        return codes.to_numpy(dtype=np.int64)
+    numeric = pd.to_numeric(codes, errors="coerce").to_numpy(dtype=float)
+    invalid = np.isnan(numeric) | (numeric != np.round(numeric))
+    return np.where(invalid, INVALID_KEY, numeric).astype(np.int64)
+
+
+def format_region_codes(keys: np.ndarray) -> np.ndarray:
+    """
+    Claves enteras -> códigos de 5 dígitos ('01100').
+    """
+    return pd.Series(keys, dtype=np.int64).astype(str).str.zfill(5).to_numpy()
+
+
+def normalize_region_codes(codes: pd.Series) -> np.ndarray:
+    """
+    Códigos de región del shapefile a 5 dígitos ('01100'). Los no numéricos
+    se ajustan como cadenas (strip + zfill).
+    """
+    keys = region_keys(codes)
+    normalized = format_region_codes(keys)
+    invalid = keys == INVALID_KEY
+    if invalid.any():
+        normalized[invalid] = codes[invalid].astype(str).str.strip().str.zfill(5)
+    return normalized
+
+
+def key_index(keys: np.ndarray):
+    """
+    Índice clave -> posición de fila de un indicador: (claves ordenadas,
+    posición de cada una, claves repetidas). Si una clave se repite se usa su
+    primera fila.
+    """
+    sorted_keys, first = np.unique(keys, return_index=True)
+    valid = sorted_keys != INVALID_KEY
+    counts = np.bincount(np.searchsorted(sorted_keys, keys), minlength=len(sorted_keys))
+    duplicated = sorted_keys[valid & (counts > 1)]
+    return sorted_keys[valid], first[valid], duplicated
+
+
+def lookup_positions(index, keys: np.ndarray) -> np.ndarray:
+    """
+    Posición en el indicador de cada clave de `keys` (-1 si no está), con una
+    búsqueda binaria vectorizada sobre el índice de key_index.
+    """
+    sorted_keys, positions, _ = index
+    if len(sorted_keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int64)
+    slot = np.clip(np.searchsorted(sorted_keys, keys), 0, len(sorted_keys) - 1)
+    return np.where(sorted_keys[slot] == keys, positions[slot], -1)
+
 
-def prepare_geodata(gdf: gpd.GeoDataFrame, df: pd.DataFrame) -> gpd.GeoDataFrame:
+def _take_column(column: pd.Series, rows: np.ndarray):
+    """
+    Columna del indicador en el orden del shapefile (NaN donde no hay fila).
+    Los nombres llegan como categóricos (ver data_loader._read_csv), así que
+    solo se copian sus códigos enteros.
+    """
+    values = column.array if isinstance(column.dtype, pd.CategoricalDtype) else column.to_numpy()
+    return pd.api.extensions.take(values, rows, allow_fill=True)
+
+
+def _compute_join_plan(shp_codes: pd.Series, shp_keys: np.ndarray, csv_codes: pd.Series):
+    """
+    Fila del indicador para cada polígono (-1 si no tiene) y diagnóstico del
+    join (ver prepare_geodata).
+    """
+    csv_keys = region_keys(csv_codes)
+    index = key_index(csv_keys)
+    rows = lookup_positions(index, shp_keys)
+    unknown = np.isin(csv_keys, shp_keys, invert=True) | (csv_keys == INVALID_KEY)
+    report = {
+        "missing": [str(code) for code in shp_codes.to_numpy()[rows < 0]],
+        "unknown": [str(code) for code in csv_codes.to_numpy()[unknown]],
+        "duplicated": format_region_codes(index[2]).tolist(),
+    }
+    return rows, report
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _shapefile_keys(_shp_codes: pd.Series, shp_version) -> np.ndarray:
+    """
+    Claves enteras de los polígonos, una vez por versión del shapefile (los
+    códigos no se hashean: la versión los identifica).
+    """
+    return region_keys(_shp_codes)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def _join_plan(_shp_codes: pd.Series, _csv_codes: pd.Series, versions: tuple):
+    """
+    _compute_join_plan cacheado por las versiones (shapefile, indicador) en
+    lugar de por el contenido de los códigos.
+    """
+    shp_keys = _shapefile_keys(_shp_codes, versions[0])
+    return _compute_join_plan(_shp_codes, shp_keys, _csv_codes)
+
+
+def prepare_geodata(gdf: "gpd.GeoDataFrame", df: pd.DataFrame, versions: tuple = None) -> "gpd.GeoDataFrame":
     """
     Realiza todos los pasos necesarios para preparar el GDF final:
-    - Renombrar columna 'Codigo comarca' -> 'id_region' en el CSV
-    - Ajustar formato de 'id_region' a 5 dígitos (zfill(5))
-    - Merge (left join)
+    - Claves enteras de 'Codigo comarca' (CSV) y de 'id_region' (shapefile)
+    - Left join por posición: para cada polígono se busca su fila del
+      indicador en un índice (key_index) y las columnas se añaden con un
+      `take` vectorizado, sin merge de cadenas
     - Reproyectar a EPSG:4326 si es necesario
-    """
-    # 1. Renombrar y ajustar la columna en el CSV
-    df = df.rename(columns={"Codigo comarca": "id_region"})
-    df["id_region"] = df["id_region"].astype(str).str.strip().str.zfill(5)
 
-    # 2. Ajustar id_region en el shapefile
-    gdf["id_region"] = gdf["id_region"].astype(str).str.strip().str.zfill(5)
+    Con `versions` = (versión del shapefile, versión del indicador) las
+    claves, el índice y el diagnóstico se calculan una vez por versión de los
+    datos (load_shapefile ya entrega 'id_region' normalizado); sin ellas se
+    calcula todo en cada llamada.
 
-    # 3. Merge
-    gdf_merged = gdf.merge(df, on="id_region", how="left")
+    El resultado lleva en attrs["join_report"] los códigos que no han casado:
+    'missing' (polígonos sin fila en el indicador), 'unknown' (filas del
+    indicador sin polígono) y 'duplicated' (códigos repetidos en el
+    indicador; se usa su primera fila). Ver join_warnings().
+    """
+    # 1. Fila del indicador de cada polígono y diagnóstico de códigos sin pareja o repetidos
+    if versions is not None:
+        rows, report = _join_plan(gdf["id_region"], df["Codigo comarca"], versions)
+    else:
+        gdf["id_region"] = normalize_region_codes(gdf["id_region"])
+        shp_keys = region_keys(gdf["id_region"])
+        rows, report = _compute_join_plan(gdf["id_region"], shp_keys, df["Codigo comarca"])
 
-    # 4. Reproyectar si no está en WGS84
+    # 2. Join por posición
+    indicator = df.drop(columns="Codigo comarca")
+    overlap = set(indicator.columns) & set(gdf.columns)
+    new_columns = {
+        (f"{col}_y" if col in overlap else col): _take_column(indicator[col], rows)
+        for col in indicator.columns
+    }
+    gdf_merged = gdf.rename(columns={col: f"{col}_x" for col in overlap}).assign(**new_columns)
+    gdf_merged.attrs["join_report"] = report
+
+    # 3. Reproyectar si no está en WGS84
     if gdf_merged.crs != "EPSG:4326":
         gdf_merged = gdf_merged.to_crs(epsg=4326)
 
     return gdf_merged
 
-def detect_year_columns(gdf_merged: gpd.GeoDataFrame) -> list:
+
+def join_warnings(gdf_merged: "gpd.GeoDataFrame", max_codes: int = 10) -> list:
+    """
+    Avisos legibles a partir de attrs["join_report"] de prepare_geodata.
+    """
+    report = gdf_merged.attrs.get("join_report", {})
+    messages = {
+        "missing": "{n} comarca(s) del mapa sin datos en el indicador: {codes}",
+        "unknown": "{n} código(s) del indicador que no están en el mapa: {codes}",
+        "duplicated": "{n} código(s) repetidos en el indicador (se usa la primera fila): {codes}",
+    }
+    warnings = []
+    for key, template in messages.items():
+        codes = report.get(key, [])
+        if codes:
+            shown = ", ".join(codes[:max_codes]) + ("…" if len(codes) > max_codes else "")
+            warnings.append(template.format(n=len(codes), codes=shown))
+    return warnings
+
+def detect_year_columns(gdf_merged: "gpd.GeoDataFrame") -> list:
     """
     Devuelve la lista de columnas que son dígitos puros (posibles años).
     """
@@ -35,7 +187,7 @@ def detect_year_columns(gdf_merged: gpd.GeoDataFrame) -> list:
     year_cols = [col for col in all_columns if col.isdigit()]
     return year_cols
 
-def convert_year_to_numeric(gdf_merged: gpd.GeoDataFrame, selected_year: str) -> gpd.GeoDataFrame:
+def convert_year_to_numeric(gdf_merged: "gpd.GeoDataFrame", selected_year: str) -> "gpd.GeoDataFrame":
     """
     Convierte la columna de año a valores numéricos (p.ej. reemplazando comas por puntos).
     """
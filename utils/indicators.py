@@ -0,0 +1,98 @@
+# utils/indicators.py
+
+import json
+import unicodedata
+
+import streamlit as st
+import pandas as pd
+
+from utils.data_loader import load_csv, data_version
+from utils.derived_indicators import DERIVED_INDICATORS, NON_ADDITIVE_OPS, compute_derived
+
+# Indicadores base: nombre visible -> CSV en data/
+CSV_FILES = {
+    "Porcentaje establecimeintos sector construccion (% sobre total)": "data/Porcentaje establecimientos sector construccion sobre el total.csv",
+    "Contratos Indefinidos": "data/Contratos indefinidos registrados en el ano (% total contratos).csv",
+    "Contratos Anuales": "data/Contratos registrados en el ano ( habitantes).csv",
+    "Densidad comercial minorista": "data/Densidad comercial minorista ( habitantes).csv",
+    "Empleo generado microempresas": "data/Empleo generado por las microempresas (0-9 empleados) (%).csv",
+    "Indice rotación contractual": "data/Indice de rotacion contractual (contratos_personas).csv",
+    "Población contratada año": "data/Poblacion contratada en el ano ( habitantes).csv",
+    "Mayor 16 años. Sector servicios": "data/Poblacion de 16 y mas anos ocupada en el sector servicios (%).csv"
+}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _compute_derived_cached(spec: dict, base_frames: dict) -> pd.DataFrame:
+    """
+    Memoiza compute_derived por expresión y por el contenido (hash) de sus entradas.
+    """
+    return compute_derived(spec, base_frames)
+
+
+def list_indicators(additive_only: bool = False) -> list:
+    """
+    Devuelve los nombres de todos los indicadores seleccionables: primero los
+    base (CSV) y a continuación los derivados.
+    Con `additive_only` se omiten los derivados que no se pueden repartir como
+    partes de un total (ver NON_ADDITIVE_OPS), p.ej. para el diagrama de queso.
+    """
+    derived = [
+        name for name, spec in DERIVED_INDICATORS.items()
+        if not (additive_only and spec["op"] in NON_ADDITIVE_OPS)
+    ]
+    return list(CSV_FILES.keys()) + derived
+
+
+def indicator_slug(name: str) -> str:
+    """
+    Nombre seguro (ASCII, minúsculas y '_') de un indicador, para carpetas y URLs.
+    """
+    ascii_text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    slug = "".join(ch.lower() if ch.isalnum() else "_" for ch in ascii_text)
+    return "_".join(part for part in slug.split("_") if part)
+
+
+def load_indicator(name: str) -> pd.DataFrame:
+    """
+    Devuelve el DataFrame de un indicador con el formato de los CSV
+    ('Codigo comarca', 'Comarca' y una columna por año).
+    Los indicadores derivados se calculan solo cuando se piden (y se cachean).
+    """
+    if name in CSV_FILES:
+        return load_csv(CSV_FILES[name])
+
+    if name in DERIVED_INDICATORS:
+        spec = DERIVED_INDICATORS[name]
+        base_frames = {base: load_indicator(base) for base in spec["inputs"]}
+        return _compute_derived_cached(spec, base_frames)
+
+    raise KeyError(f"Indicador desconocido: {name}")
+
+
+def indicator_sources(name: str) -> list:
+    """
+    Devuelve las rutas de los CSV de los que depende un indicador (el suyo si es
+    base, o los de todas sus entradas, recursivamente, si es derivado).
+    """
+    if name in CSV_FILES:
+        return [CSV_FILES[name]]
+
+    if name in DERIVED_INDICATORS:
+        sources = []
+        for base in DERIVED_INDICATORS[name]["inputs"]:
+            sources += [path for path in indicator_sources(base) if path not in sources]
+        return sources
+
+    raise KeyError(f"Indicador desconocido: {name}")
+
+
+def indicator_version(name: str) -> tuple:
+    """
+    Versión de un indicador: las de sus CSV de origen y, si es derivado, su
+    definición. Identifica su contenido en las cachés por versión (p.ej. el
+    join de geoutils.prepare_geodata).
+    """
+    spec = DERIVED_INDICATORS.get(name)
+    sources = tuple(data_version(path) for path in indicator_sources(name))
+    return sources + ((json.dumps(spec, sort_keys=True),) if spec else ())
@@ -0,0 +1,326 @@
+# utils/interview_jobs.py
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import streamlit as st
+
+from utils.interview_store import load_interviews, update_interviews
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.path.join("data", "json_folder", "jobs")
+STORE_PATH = os.path.join("data", "json_folder", "territorial_data.json")
+EXTRACTION_MODEL = "gpt-4o"
+
+EXTRACTION_PROMPT = (
+    "Eres un analista de desarrollo territorial. Recibirás una lista JSON de entrevistas, "
+    "cada una con un 'id' y las respuestas libres del entrevistado. Para cada entrevista, "
+    "extrae la información en campos estructurados. Responde SOLO con un objeto JSON con la forma "
+    '{"resultados": [{"id": "...", "empresas": ["..."], "kpis": ["..."], '
+    '"fuentes_datos": ["..."], "desafios": ["..."]}]}. '
+    "Usa listas vacías si no hay información. No inventes datos."
+)
+
+
+def extract_with_openai(interviews: list) -> dict:
+    """
+    Extrae campos estructurados de varias entrevistas con UNA sola llamada al LLM.
+    Devuelve {id_entrevista: {empresas, kpis, fuentes_datos, desafios}}.
+    """
+    from openai import OpenAI
+
+    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    payload = [
+        {"id": interview["id"], "respuestas": interview.get("territorial_info", {})}
+        for interview in interviews
+    ]
+    completion = client.chat.completions.create(
+        model=EXTRACTION_MODEL,
+        response_format={"type": "json_object"},
+        messages=[
+            {"role": "system", "content": EXTRACTION_PROMPT},
+            {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+        ],
+    )
+    data = json.loads(completion.choices[0].message.content)
+    return {
+        str(item["id"]): {key: value for key, value in item.items() if key != "id"}
+        for item in data.get("resultados", [])
+        if "id" in item
+    }
+
+
+class InterviewJobQueue:
+    """
+    Cola local de trabajos de post-procesado de entrevistas terminadas.
+
+    - Cada trabajo es un fichero JSON en `jobs_dir`, así que la cola sobrevive a
+      reinicios: al crearla se leen una sola vez los trabajos pendientes y a
+      partir de ahí se llevan en memoria.
+    - Hay como mucho un trabajo pendiente (o en curso) por entrevista:
+      encolar de nuevo una entrevista que ya está en la cola no hace nada.
+    - Los trabajos terminados se mueven a `jobs_dir/archive/done` o
+      `jobs_dir/archive/failed`, fuera de la carpeta de pendientes.
+    - Un hilo en segundo plano agrupa hasta `batch_size` entrevistas en una sola
+      llamada al extractor (LLM), espera como mucho `max_wait` segundos a que se
+      llene el lote y respeta un intervalo mínimo entre llamadas (`min_interval`).
+    - Si la llamada falla se reintenta con espera exponencial; tras
+      `max_attempts` intentos fallidos el trabajo queda como 'failed'. Un lote
+      interrumpido por stop() no cuenta como intento: sus trabajos siguen
+      pendientes tal como estaban.
+    - Los resultados se escriben en el almacén de entrevistas (campo 'estructurado').
+
+    Está pensada para un único proceso servidor (un solo hilo consume la cola).
+    """
+    def __init__(self, jobs_dir: str = JOBS_DIR, store_path: str = STORE_PATH,
+                 extractor=extract_with_openai, batch_size: int = 5, max_wait: float = 30.0,
+                 min_interval: float = 2.0, max_attempts: int = 5, poll_interval: float = 2.0):
+        self.jobs_dir = jobs_dir
+        self.store_path = store_path
+        self.extractor = extractor
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._next_call = 0.0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        for status in ("done", "failed"):
+            os.makedirs(self._archive_dir(status), exist_ok=True)
+
+        # Trabajos pendientes en memoria (id -> trabajo); el disco solo se lee aquí
+        self._pending = {}
+        for job in self._load_jobs():
+            if job["status"] == "pending" and self._pending_for(job["interview_id"]) is not None:
+                job.update(status="failed", error="Trabajo duplicado")
+            if job["status"] == "pending":
+                self._pending[job["id"]] = job
+            else:
+                self._archive_job(job)
+
+    # ------------------------------------------------------------------
+    # Persistencia de trabajos
+    # ------------------------------------------------------------------
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _archive_dir(self, status: str) -> str:
+        return os.path.join(self.jobs_dir, "archive", status)
+
+    def _archive_job(self, job: dict):
+        """
+        Guarda un trabajo terminado ('done' o 'failed') en su carpeta de archivo.
+        """
+        self._save_job(job)
+        os.replace(self._job_path(job["id"]), os.path.join(self._archive_dir(job["status"]), f"{job['id']}.json"))
+
+    def _save_job(self, job: dict):
+        path = self._job_path(job["id"])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _load_jobs(self) -> list:
+        jobs = []
+        for name in sorted(os.listdir(self.jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                    jobs.append(json.load(f))
+            except (OSError, json.JSONDecodeError):
+                logger.warning("Trabajo ilegible en la cola: %s", name)
+        return jobs
+
+    def _pending_for(self, interview_id: str):
+        """
+        Trabajo pendiente o en curso de una entrevista (None si no hay).
+        """
+        for job in self._pending.values():
+            if job["interview_id"] == interview_id:
+                return job
+        return None
+
+    def enqueue(self, interview_id: str) -> str:
+        """
+        Añade una entrevista terminada a la cola. No bloquea: devuelve el id del
+        trabajo (el ya existente si la entrevista está pendiente o en curso).
+        """
+        now = time.time()
+        with self._lock:
+            existing = self._pending_for(interview_id)
+            if existing is not None:
+                return existing["id"]
+            job = {
+                "id": uuid.uuid4().hex,
+                "interview_id": interview_id,
+                "status": "pending",
+                "attempts": 0,
+                "created": now,
+                "not_before": now,
+                "error": None,
+            }
+            self._save_job(job)
+            self._pending[job["id"]] = job
+        self._wake.set()
+        return job["id"]
+
+    def pending_jobs(self) -> list:
+        """
+        Trabajos pendientes, del más antiguo al más reciente.
+        """
+        with self._lock:
+            jobs = [dict(job) for job in self._pending.values()]
+        return sorted(jobs, key=lambda job: job["created"])
+
+    def stats(self) -> dict:
+        """
+        Número de trabajos por estado.
+        """
+        with self._lock:
+            counts = {"pending": len(self._pending)}
+        for status in ("done", "failed"):
+            counts[status] = sum(1 for name in os.listdir(self._archive_dir(status)) if name.endswith(".json"))
+        return counts
+
+    # ------------------------------------------------------------------
+    # Procesado
+    # ------------------------------------------------------------------
+    def _wait_rate_limit(self):
+        delay = self._next_call - time.monotonic()
+        if delay > 0:
+            self._stop.wait(delay)
+        self._next_call = time.monotonic() + self.min_interval
+
+    def _call_with_retries(self, interviews: list):
+        """
+        Llama al extractor con espera exponencial entre reintentos (1, 2, 4... s).
+        Devuelve None si stop() interrumpe los intentos: el lote no ha fallado.
+        """
+        last_error = None
+        for attempt in range(3):
+            self._wait_rate_limit()
+            if self._stop.is_set():
+                return None
+            try:
+                return self.extractor(interviews)
+            except Exception as e:
+                if self._stop.is_set():
+                    return None
+                last_error = e
+                logger.warning("Fallo en la extracción por lotes (intento %d): %s", attempt + 1, e)
+                self._stop.wait(2 ** attempt)
+        raise RuntimeError(f"Extracción fallida: {last_error}")
+
+    def _ready_batch(self, force: bool = False) -> list:
+        """
+        Devuelve el siguiente lote si está lleno, si el trabajo más antiguo ya ha
+        esperado `max_wait` segundos o si se fuerza.
+        """
+        now = time.time()
+        ready = [job for job in self.pending_jobs() if job["not_before"] <= now]
+        if not ready:
+            return []
+        if force or len(ready) >= self.batch_size or now - ready[0]["created"] >= self.max_wait:
+            return ready[:self.batch_size]
+        return []
+
+    def process_once(self, force: bool = False) -> int:
+        """
+        Procesa un lote (si hay alguno listo). Devuelve el número de trabajos completados.
+        """
+        batch = self._ready_batch(force)
+        if not batch:
+            return 0
+
+        interviews_by_id = {entry.get("id"): entry for entry in load_interviews(self.store_path)}
+        interviews = [interviews_by_id[job["interview_id"]] for job in batch if job["interview_id"] in interviews_by_id]
+
+        try:
+            results = self._call_with_retries(interviews) if interviews else {}
+            error = None
+        except Exception as e:
+            results, error = {}, str(e)
+        if results is None:
+            # Interrumpido al parar el servidor: los trabajos siguen pendientes sin cambios
+            return 0
+
+        processed_at = datetime.now().isoformat()
+        update_interviews(self.store_path, {
+            interview_id: {"estructurado": fields, "estructurado_timestamp": processed_at}
+            for interview_id, fields in results.items()
+        })
+
+        completed = 0
+        for job in batch:
+            if job["interview_id"] not in interviews_by_id:
+                job.update(status="failed", error="Entrevista no encontrada en el almacén")
+            elif job["interview_id"] in results:
+                job.update(status="done", error=None)
+                completed += 1
+            else:
+                job["attempts"] += 1
+                job["error"] = error or "Sin resultado para esta entrevista"
+                if job["attempts"] >= self.max_attempts:
+                    job["status"] = "failed"
+                else:
+                    job["not_before"] = time.time() + 30 * 2 ** job["attempts"]
+
+            if job["status"] == "pending":
+                self._save_job(job)
+                with self._lock:
+                    self._pending[job["id"]] = job
+            else:
+                self._archive_job(job)
+                with self._lock:
+                    self._pending.pop(job["id"], None)
+        return completed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                while self.process_once():
+                    pass
+            except Exception:
+                logger.exception("Error inesperado en la cola de entrevistas")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        """
+        Arranca el hilo trabajador (idempotente).
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="interview-jobs", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Detiene el hilo trabajador; los trabajos pendientes siguen en disco.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+@st.cache_resource
+def get_job_queue() -> InterviewJobQueue:
+    """
+    Cola única por proceso servidor, con su hilo trabajador ya arrancado.
+    """
+    queue = InterviewJobQueue()
+    queue.start()
+    return queue
@@ -0,0 +1,80 @@
+# utils/interview_store.py
+
+import json
+import os
+import threading
+
+# Un único lock por proceso: lo comparten el guardado desde la página y el
+# trabajador en segundo plano que escribe los resultados estructurados.
+_STORE_LOCK = threading.Lock()
+
+
+def _read_entries(json_path: str) -> list:
+    if not os.path.exists(json_path):
+        return []
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if isinstance(data, list) else [data]
+
+
+def _write_entries(json_path: str, entries: list):
+    """
+    Escritura atómica (fichero temporal + rename): un lector nunca ve el JSON a medias.
+    """
+    os.makedirs(os.path.dirname(json_path), exist_ok=True)
+    tmp_path = json_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, json_path)
+
+
+def load_interviews(json_path: str) -> list:
+    """
+    Devuelve todas las entrevistas guardadas.
+    """
+    with _STORE_LOCK:
+        return _read_entries(json_path)
+
+
+def append_interview(json_path: str, entry: dict):
+    """
+    Añade una entrevista al final del almacén.
+    """
+    with _STORE_LOCK:
+        entries = _read_entries(json_path)
+        entries.append(entry)
+        _write_entries(json_path, entries)
+
+
+def save_interview(json_path: str, entry: dict):
+    """
+    Guarda una entrevista: sustituye la que tenga su mismo 'id' o, si no
+    existe, la añade al final del almacén.
+    """
+    with _STORE_LOCK:
+        entries = _read_entries(json_path)
+        for position, existing in enumerate(entries):
+            if existing.get("id") == entry["id"]:
+                entries[position] = entry
+                break
+        else:
+            entries.append(entry)
+        _write_entries(json_path, entries)
+
+
+def update_interviews(json_path: str, updates: dict) -> int:
+    """
+    Mezcla campos en las entrevistas indicadas: {id_entrevista: {campo: valor}}.
+    Devuelve cuántas entrevistas se han actualizado.
+    """
+    with _STORE_LOCK:
+        entries = _read_entries(json_path)
+        updated = 0
+        for entry in entries:
+            fields = updates.get(entry.get("id"))
+            if fields:
+                entry.update(fields)
+                updated += 1
+        if updated:
+            _write_entries(json_path, entries)
+        return updated
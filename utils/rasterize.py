@@ -0,0 +1,163 @@
+# utils/rasterize.py
+
+import base64
+import io
+import math
+
+import numpy as np
+import streamlit as st
+
+from utils.data_loader import load_shapefile, data_version
+
+# A partir de cuántos polígonos el modo automático pasa a ráster
+RASTER_POLYGON_THRESHOLD = 1500
+# Anchos de imagen disponibles (px); el alto sale de la proporción del mapa
+RASTER_WIDTHS = [800, 1200, 1600, 2400]
+NO_DATA_RGBA = (217, 217, 217, 255)
+
+
+def rasterize_labels(gdf, width: int):
+    """
+    Rasteriza los polígonos de `gdf` en una rejilla de `width` píxeles de ancho
+    en Web Mercator (la proyección en la que Mapbox dibuja las imágenes).
+    Cada píxel guarda la posición (fila de gdf) del polígono que contiene su
+    centro, o -1 si no cae en ninguno.
+    Devuelve (etiquetas alto × ancho, esquinas lon/lat en el orden que espera
+    una capa de imagen de Mapbox: sup-izq, sup-der, inf-der, inf-izq).
+    """
+    import shapely
+    from pyproj import Transformer
+
+    geoms = gdf.to_crs(epsg=3857).geometry.values
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+    height = max(1, round(width * (maxy - miny) / (maxx - minx)))
+    dx, dy = (maxx - minx) / width, (maxy - miny) / height
+
+    labels = np.full((height, width), -1, dtype=np.int32)
+    shapely.prepare(geoms)
+    bounds = shapely.bounds(geoms)
+
+    # Cada polígono solo se evalúa sobre los píxeles de su rectángulo envolvente
+    col0 = np.clip(np.floor((bounds[:, 0] - minx) / dx - 0.5), 0, width - 1).astype(int)
+    col1 = np.clip(np.ceil((bounds[:, 2] - minx) / dx - 0.5), 0, width - 1).astype(int)
+    row0 = np.clip(np.floor((maxy - bounds[:, 3]) / dy - 0.5), 0, height - 1).astype(int)
+    row1 = np.clip(np.ceil((maxy - bounds[:, 1]) / dy - 0.5), 0, height - 1).astype(int)
+
+    for k, geom in enumerate(geoms):
+        if geom is None or geom.is_empty:
+            continue
+        cols = np.arange(col0[k], col1[k] + 1)
+        rows = np.arange(row0[k], row1[k] + 1)
+        xs = minx + (cols + 0.5) * dx
+        ys = maxy - (rows + 0.5) * dy
+        inside = shapely.contains_xy(geom, xs[None, :], ys[:, None])
+        window = labels[row0[k]:row1[k] + 1, col0[k]:col1[k] + 1]
+        window[inside] = k
+
+    to_lonlat = Transformer.from_crs(3857, 4326, always_xy=True)
+    corner_x = [minx, maxx, maxx, minx]
+    corner_y = [maxy, maxy, miny, miny]
+    lons, lats = to_lonlat.transform(corner_x, corner_y)
+    return labels, [[float(lon), float(lat)] for lon, lat in zip(lons, lats)]
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _label_mask_cached(shp_path: str, version: str, width: int):
+    import shapely
+
+    gdf = load_shapefile(shp_path)
+    ids = gdf["id_region"].astype(str).str.strip().str.zfill(5).to_numpy()
+    labels, corners = rasterize_labels(gdf, width)
+
+    # Un punto interior por polígono para los clics (la búsqueda va a los datos vectoriales)
+    points = shapely.point_on_surface(gdf.to_crs(epsg=4326).geometry.values)
+    return ids, labels, corners, shapely.get_x(points), shapely.get_y(points)
+
+
+def load_label_mask(shp_path: str, width: int):
+    """
+    Máscara polígono -> píxel del shapefile, cacheada por versión del fichero y
+    resolución: al cambiar de año o de indicador solo cambian los colores.
+    Devuelve (id_region de cada polígono, etiquetas, esquinas lon/lat,
+    lon y lat de un punto interior de cada polígono).
+    """
+    return _label_mask_cached(shp_path, data_version(shp_path), width)
+
+
+def _hex_to_rgba(color: str) -> tuple:
+    """
+    '#rrggbb' o 'rgb(r, g, b)' -> (r, g, b, 255).
+    """
+    color = color.strip()
+    if color.startswith("#"):
+        return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5)) + (255,)
+    channels = color[color.index("(") + 1:color.index(")")].split(",")
+    return tuple(int(float(c)) for c in channels[:3]) + (255,)
+
+
+def continuous_colors(values: np.ndarray, scale: str = "YlGnBu", steps: int = 256) -> np.ndarray:
+    """
+    Color RGBA (uint8) de cada valor en una escala continua de Plotly, con una
+    tabla de `steps` colores y una sola indexación. NaN -> gris "sin datos".
+    """
+    import plotly.express as px
+
+    lut = np.array([
+        _hex_to_rgba(c) for c in px.colors.sample_colorscale(scale, np.linspace(0, 1, steps))
+    ], dtype=np.uint8)
+
+    values = np.asarray(values, dtype=float)
+    colors = np.tile(np.array(NO_DATA_RGBA, dtype=np.uint8), (len(values), 1))
+    valid = ~np.isnan(values)
+    if valid.any():
+        vmin, vmax = values[valid].min(), values[valid].max()
+        scaled = (values[valid] - vmin) / (vmax - vmin) if vmax > vmin else np.zeros(valid.sum())
+        colors[valid] = lut[np.round(scaled * (steps - 1)).astype(int)]
+    return colors
+
+
+def categorical_colors(categories, color_map: dict) -> np.ndarray:
+    """
+    Color RGBA (uint8) de cada categoría según `color_map` (etiqueta -> color).
+    """
+    palette = {label: _hex_to_rgba(color) for label, color in color_map.items()}
+    return np.array([palette.get(c, NO_DATA_RGBA) for c in categories], dtype=np.uint8)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _raster_png_cached(shp_path: str, version: str, width: int, region_rgba: np.ndarray) -> bytes:
+    from PIL import Image
+
+    _, labels, _, _, _ = _label_mask_cached(shp_path, version, width)
+    # Tabla de colores: posición 0 = fuera de cualquier polígono (transparente)
+    lut = np.vstack([np.zeros((1, 4), dtype=np.uint8), region_rgba])
+    image = Image.fromarray(lut[labels + 1], mode="RGBA")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def raster_image_uri(shp_path: str, width: int, region_rgba: np.ndarray) -> str:
+    """
+    PNG (data URI) de la máscara coloreada con un color por polígono
+    (`region_rgba`, en el orden de load_label_mask). Cacheado por colores.
+    """
+    png = _raster_png_cached(shp_path, data_version(shp_path), width, region_rgba)
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def use_raster(n_polygons: int, mode: str) -> bool:
+    """
+    Decide el modo de dibujo: 'auto' usa ráster a partir de RASTER_POLYGON_THRESHOLD.
+    """
+    if mode == "auto":
+        return n_polygons >= RASTER_POLYGON_THRESHOLD
+    return mode == "raster"
+
+
+def default_width(n_polygons: int) -> int:
+    """
+    Resolución por defecto: más píxeles cuantos más polígonos (hasta 2400 px).
+    """
+    wanted = 800 * math.sqrt(max(n_polygons, 1) / RASTER_POLYGON_THRESHOLD)
+    return next((w for w in RASTER_WIDTHS if w >= wanted), RASTER_WIDTHS[-1])
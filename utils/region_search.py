@@ -0,0 +1,229 @@
+# utils/region_search.py
+
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+import streamlit as st
+
+from utils.data_loader import load_shapefile, load_csv, data_version
+from utils.indicators import CSV_FILES
+
+# Puntuaciones por tipo de coincidencia (se queda la mejor de cada región)
+SCORE_EXACT = 1.0
+SCORE_PREFIX = 0.9
+SCORE_WORD_PREFIX = 0.8
+SCORE_SUBSTRING = 0.7
+SCORE_TRIGRAM = 0.6
+# Fracción mínima de los trigramas de la consulta presentes en el alias
+MIN_TRIGRAM_COVERAGE = 0.5
+# Opciones del selector sin consulta (recientes + primeras por orden alfabético)
+BROWSE_LIMIT = 20
+# Regiones elegidas recientemente que se recuerdan por selector
+RECENT_LIMIT = 8
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def fold(text: str) -> str:
+    """
+    Normaliza un texto para buscar: sin tildes ni diacríticos, en minúsculas y
+    con cualquier signo convertido en un espacio ("Cantábrica-Alavesa" ->
+    "cantabrica alavesa"). Los caracteres perdidos por una mala codificación
+    (U+FFFD, como en algunos CSV) se eliminan.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text).replace("\ufffd", ""))
+    ascii_text = "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+    return _NON_ALNUM.sub(" ", ascii_text).strip()
+
+
+def _trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class RegionSearchIndex:
+    """
+    Índice de búsqueda de regiones por nombre (en castellano y euskera, con o
+    sin tildes) y por código. Se construye una vez por versión del shapefile.
+
+    Cada región tiene varios alias normalizados (nombre, código y los nombres
+    alternativos de `aliases`; los bilingües "A / B" también por partes). Una
+    consulta se puntúa contra todos los alias a la vez: coincidencia exacta,
+    prefijo, prefijo de todas las palabras, subcadena y, para errores de
+    escritura, proporción de trigramas de la consulta presentes en el alias.
+    Si hay coincidencias exactas o por prefijo solo se devuelven esas, y las
+    consultas numéricas (códigos) no usan trigramas.
+    """
+    def __init__(self, codes, names, aliases=None):
+        self.codes = [str(code) for code in codes]
+        self.names = [str(name) for name in names]
+        aliases = aliases if aliases is not None else [[] for _ in self.names]
+
+        alias_text, alias_region = [], []
+        for region, (code, name, alt_names) in enumerate(zip(self.codes, self.names, aliases)):
+            variants = {code}
+            for label in [name] + list(alt_names):
+                variants |= {fold(label)} | {fold(part) for part in label.split("/")}
+            for variant in sorted(v for v in variants if v):
+                alias_text.append(variant)
+                alias_region.append(region)
+        self.alias_text = np.array(alias_text)
+        self.alias_region = np.array(alias_region, dtype=np.int64)
+
+        # Palabras ordenadas para búsquedas por prefijo con bisect
+        words = sorted(
+            (word, region)
+            for text, region in zip(alias_text, alias_region)
+            for word in text.split()
+        )
+        self._words = [word for word, _ in words]
+        self._word_region = np.array([region for _, region in words], dtype=np.int64)
+
+        # Listas invertidas de trigramas -> alias
+        postings = {}
+        for alias, text in enumerate(alias_text):
+            for gram in _trigrams(text):
+                postings.setdefault(gram, []).append(alias)
+        self._postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+        self.sorted_names = sorted(self.names, key=fold)
+
+    def _word_prefix_regions(self, word: str) -> np.ndarray:
+        start = bisect.bisect_left(self._words, word)
+        end = bisect.bisect_left(self._words, word + "\x7f")  # tras cualquier carácter ASCII normalizado
+        return np.unique(self._word_region[start:end])
+
+    def search(self, query: str, limit: int = 10) -> list:
+        """
+        Regiones que encajan con `query`, de mejor a peor:
+        lista de (código, nombre, puntuación).
+        """
+        q = fold(query)
+        if not q:
+            return []
+
+        alias_scores = np.zeros(len(self.alias_text))
+        alias_scores[self.alias_text == q] = SCORE_EXACT
+        starts = np.char.startswith(self.alias_text, q)
+        alias_scores[starts] = np.maximum(alias_scores[starts], SCORE_PREFIX)
+        if starts.any():
+            # Hay coincidencias exactas o por prefijo: solo se devuelven esas
+            return self._ranked(alias_scores, limit)
+
+        contains = np.char.find(self.alias_text, q) >= 0
+        alias_scores[contains] = np.maximum(alias_scores[contains], SCORE_SUBSTRING)
+
+        # Trigramas compartidos, para tolerar errores de escritura (no en
+        # códigos: "01100" y "01200" comparten trigramas sin parecerse)
+        grams = _trigrams(q)
+        hits = [self._postings[g] for g in grams if g in self._postings]
+        if hits and not q.replace(" ", "").isdigit():
+            shared = np.bincount(np.concatenate(hits), minlength=len(self.alias_text))
+            coverage = shared / len(grams)
+            fuzzy = coverage >= MIN_TRIGRAM_COVERAGE
+            alias_scores[fuzzy] = np.maximum(alias_scores[fuzzy], SCORE_TRIGRAM * coverage[fuzzy])
+
+        # Todas las palabras de la consulta son prefijo de alguna palabra de la región
+        word_sets = [self._word_prefix_regions(word) for word in q.split()]
+        common = word_sets[0]
+        for regions in word_sets[1:]:
+            common = np.intersect1d(common, regions)
+        return self._ranked(alias_scores, limit, word_prefix_regions=common)
+
+    def _ranked(self, alias_scores: np.ndarray, limit: int, word_prefix_regions=None) -> list:
+        """
+        Mejor puntuación de cada región (por sus alias) y orden de resultados.
+        """
+        region_scores = np.zeros(len(self.names))
+        np.maximum.at(region_scores, self.alias_region, alias_scores)
+        if word_prefix_regions is not None:
+            region_scores[word_prefix_regions] = np.maximum(region_scores[word_prefix_regions], SCORE_WORD_PREFIX)
+
+        found = np.flatnonzero(region_scores > 0)
+        ranked = sorted(found, key=lambda r: (-region_scores[r], fold(self.names[r])))
+        return [(self.codes[r], self.names[r], float(region_scores[r])) for r in ranked[:limit]]
+
+    def filter_options(self, query: str, keep: list = None, limit: int = 50,
+                       recent: list = None, browse_limit: int = BROWSE_LIMIT) -> list:
+        """
+        Nombres para un selector: los resultados de la búsqueda o, sin consulta,
+        las regiones de `recent` y las primeras `browse_limit` por orden
+        alfabético (no todas). Siempre incluye `keep` (lo ya seleccionado).
+        """
+        keep = list(keep or [])
+        if fold(query):
+            names = [name for _, name, _ in self.search(query, limit)]
+        else:
+            names = list(recent or []) + self.sorted_names[:browse_limit]
+        options = keep + [name for name in names if name not in keep]
+        return list(dict.fromkeys(options))
+
+
+def _store_selection(state_key: str):
+    selected = st.session_state[f"{state_key}_widget"]
+    st.session_state[state_key] = selected
+    # Las últimas elegidas se ofrecen de nuevo sin tener que buscarlas
+    recent = st.session_state.get(f"{state_key}_recent", [])
+    st.session_state[f"{state_key}_recent"] = list(dict.fromkeys(selected[::-1] + recent))[:RECENT_LIMIT]
+
+
+def region_selector(label: str, region_index: RegionSearchIndex, state_key: str,
+                    default: list = None, extra_options: list = None) -> list:
+    """
+    Buscador + multiselect de regiones en la barra lateral. El multiselect solo
+    recibe los resultados de la búsqueda (más lo ya elegido); sin búsqueda,
+    las elegidas recientemente y las primeras BROWSE_LIMIT, nunca la lista
+    completa. La selección se guarda en st.session_state[state_key]: como las
+    opciones cambian con cada búsqueda, Streamlit recrea el widget y sin esa
+    copia se perdería lo elegido.
+    `extra_options` (p.ej. "Todas") se muestran siempre al principio.
+    """
+    extra_options = list(extra_options or [])
+    selected = st.session_state.get(state_key, list(default or []))
+    query = st.sidebar.text_input("Buscar comarca (castellano, euskera o código):", key=f"{state_key}_query")
+
+    regions_selected = [name for name in selected if name not in extra_options]
+    recent = [name for name in st.session_state.get(f"{state_key}_recent", []) if name not in extra_options]
+    options = extra_options + region_index.filter_options(query, keep=regions_selected, recent=recent)
+    if not query and len(region_index.sorted_names) > BROWSE_LIMIT:
+        st.sidebar.caption(f"Escribe para buscar entre las {len(region_index.sorted_names)} comarcas.")
+    return st.sidebar.multiselect(
+        label,
+        options=options,
+        default=[name for name in selected if name in options],
+        key=f"{state_key}_widget",
+        on_change=_store_selection,
+        args=(state_key,)
+    )
+
+
+@st.cache_resource(max_entries=4)
+def _region_index_cached(shp_path: str, versions: tuple) -> RegionSearchIndex:
+    gdf = load_shapefile(shp_path)
+    gdf = gdf.dropna(subset=["COMARCA"]).drop_duplicates(subset="COMARCA")
+    codes = gdf["id_region"].astype(str).str.strip().str.zfill(5)
+
+    # Nombres alternativos: euskera del shapefile y nombres bilingües de los CSV
+    aliases = {code: set() for code in codes}
+    if "COMARC_EUS" in gdf.columns:
+        for code, name in zip(codes, gdf["COMARC_EUS"].fillna("")):
+            aliases[code].add(str(name))
+    for csv_path in CSV_FILES.values():
+        df = load_csv(csv_path)
+        csv_codes = df["Codigo comarca"].astype(str).str.strip().str.zfill(5)
+        for code, name in zip(csv_codes, df["Comarca"].astype(str)):
+            if code in aliases:
+                aliases[code].add(name)
+
+    return RegionSearchIndex(codes, gdf["COMARCA"], [sorted(aliases[code]) for code in codes])
+
+
+def load_region_index(shp_path: str) -> RegionSearchIndex:
+    """
+    Índice de búsqueda de las regiones del shapefile (compartido, de solo
+    lectura), reconstruido solo cuando cambian el shapefile o los CSV.
+    """
+    versions = tuple(data_version(path) for path in [shp_path] + list(CSV_FILES.values()))
+    return _region_index_cached(shp_path, versions)
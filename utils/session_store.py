@@ -0,0 +1,244 @@
+# utils/session_store.py
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_DIR = os.path.join("data", "json_folder", "sessions")
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+SESSION_COOKIE = "chat_sid"
+SESSION_COOKIE_MAX_AGE = 7 * 24 * 3600
+
+
+class SessionStore:
+    """
+    Almacén acotado del estado de las entrevistas, compartido por todo el servidor.
+
+    - Cada sesión se guarda como JSON (ver TerritorialChat.to_dict) en
+      `spill_dir`, en cada cambio: si el usuario vuelve (mismo navegador, ver
+      current_session_id) la entrevista se restaura aunque ya no esté en memoria.
+    - En memoria solo se mantiene una caché LRU del JSON de las sesiones
+      activas, limitada por número (`max_sessions`), bytes totales
+      (`max_total_bytes`) y tiempo sin actividad (`ttl` segundos). Las sesiones
+      que superan `max_session_bytes` se sirven solo desde disco.
+    - Los ficheros sin actividad durante `disk_ttl` segundos se borran.
+    - `metrics()` devuelve sesiones vivas, bytes en memoria y contadores; se
+      escriben también en `spill_dir/metrics.json` para la monitorización.
+    """
+    def __init__(self, spill_dir: str = SESSIONS_DIR, ttl: float = 1800.0, max_sessions: int = 200,
+                 max_session_bytes: int = 256 * 1024, max_total_bytes: int = 32 * 1024 * 1024,
+                 disk_ttl: float = 7 * 24 * 3600.0, sweep_interval: float = 60.0):
+        self.spill_dir = spill_dir
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.disk_ttl = disk_ttl
+        self.sweep_interval = sweep_interval
+
+        self._memory = OrderedDict()  # sid -> (json en bytes, último acceso)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        self._counters = {"hits": 0, "restores": 0, "misses": 0, "evictions": 0, "purged": 0}
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Disco
+    # ------------------------------------------------------------------
+    def _path(self, sid: str) -> str:
+        if not SESSION_ID_PATTERN.match(sid):
+            raise ValueError(f"Identificador de sesión no válido: {sid!r}")
+        return os.path.join(self.spill_dir, f"{sid}.json")
+
+    def _write(self, sid: str, payload: bytes):
+        path = self._path(sid)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _read(self, sid: str):
+        try:
+            with open(self._path(sid), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    # ------------------------------------------------------------------
+    # Memoria
+    # ------------------------------------------------------------------
+    def _drop(self, sid: str):
+        payload, _ = self._memory.pop(sid)
+        self._bytes -= len(payload)
+
+    def _remember(self, sid: str, payload: bytes):
+        if sid in self._memory:
+            self._drop(sid)
+        if len(payload) > self.max_session_bytes:
+            return  # Demasiado grande: solo en disco
+        self._memory[sid] = (payload, time.time())
+        self._bytes += len(payload)
+        self._evict()
+
+    def _evict(self):
+        """
+        Expulsa de memoria (no de disco) por inactividad y, después, las menos
+        usadas hasta respetar los límites de número y de bytes.
+        """
+        now = time.time()
+        while self._memory:
+            sid, (payload, last_access) = next(iter(self._memory.items()))
+            over_limits = len(self._memory) > self.max_sessions or self._bytes > self.max_total_bytes
+            if not over_limits and now - last_access <= self.ttl:
+                break
+            self._drop(sid)
+            self._counters["evictions"] += 1
+
+        if now - self._last_sweep >= self.sweep_interval:
+            self._last_sweep = now
+            self._purge_disk(now)
+            self._write_metrics()
+
+    def _purge_disk(self, now: float):
+        for name in os.listdir(self.spill_dir):
+            if not name.endswith(".json") or name == "metrics.json":
+                continue
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.disk_ttl:
+                    os.remove(path)
+                    self._counters["purged"] += 1
+            except OSError:
+                pass
+
+    def _write_metrics(self):
+        path = os.path.join(self.spill_dir, "metrics.json")
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**self._metrics(), "timestamp": time.time()}, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning("No se pudieron escribir las métricas de sesiones")
+
+    def _metrics(self) -> dict:
+        spilled = sum(
+            1 for name in os.listdir(self.spill_dir)
+            if name.endswith(".json") and name != "metrics.json"
+        )
+        return {
+            "live_sessions": len(self._memory),
+            "bytes_in_memory": self._bytes,
+            "sessions_on_disk": spilled,
+            **self._counters,
+        }
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+    def get(self, sid: str):
+        """
+        Estado (dict) de una sesión, desde memoria o, si fue expulsada, desde
+        disco. None si no existe.
+        """
+        with self._lock:
+            if sid in self._memory:
+                payload, _ = self._memory[sid]
+                self._memory.move_to_end(sid)
+                self._memory[sid] = (payload, time.time())
+                self._counters["hits"] += 1
+                self._evict()
+                return json.loads(payload)
+
+            payload = self._read(sid)
+            if payload is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["restores"] += 1
+            self._remember(sid, payload)
+            return json.loads(payload)
+
+    def put(self, sid: str, state: dict):
+        """
+        Guarda el estado de una sesión (en disco y en la caché de memoria).
+        """
+        payload = json.dumps(state, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._write(sid, payload)
+            self._remember(sid, payload)
+
+    def discard(self, sid: str):
+        """
+        Borra una sesión de memoria y de disco.
+        """
+        with self._lock:
+            if sid in self._memory:
+                self._drop(sid)
+            try:
+                os.remove(self._path(sid))
+            except FileNotFoundError:
+                pass
+
+    def metrics(self) -> dict:
+        """
+        Sesiones vivas en memoria, bytes que ocupan, sesiones en disco y contadores.
+        """
+        with self._lock:
+            return self._metrics()
+
+
+@st.cache_resource
+def get_session_store() -> SessionStore:
+    """
+    Almacén único por proceso servidor.
+    """
+    return SessionStore()
+
+
+def _set_session_cookie(sid: str):
+    """
+    Guarda el identificador en una cookie del navegador (SameSite=Strict).
+    Streamlit no permite escribir cookies desde Python: se hace con un
+    componente HTML invisible, que comparte origen con la app.
+    """
+    components.html(
+        "<script>"
+        f"window.parent.document.cookie = '{SESSION_COOKIE}={sid}; path=/; "
+        f"max-age={SESSION_COOKIE_MAX_AGE}; SameSite=Strict';"
+        "</script>",
+        height=0
+    )
+
+
+def current_session_id() -> str:
+    """
+    Identificador de la sesión del visitante. Se guarda en st.session_state y en
+    una cookie del navegador, de modo que al recargar o reconectar desde el
+    mismo navegador se recupera la misma entrevista.
+
+    El identificador da acceso a las respuestas de la entrevista, así que nunca
+    se pone en la URL: un enlace copiado no abre la entrevista de otra persona.
+    Si llega un ?sid= (enlaces antiguos) se ignora y se quita de la URL.
+    """
+    if "sid" in st.query_params:
+        del st.query_params["sid"]
+
+    sid = st.session_state.get("chat_sid") or st.context.cookies.get(SESSION_COOKIE, "")
+    if not SESSION_ID_PATTERN.match(sid):
+        sid = uuid.uuid4().hex
+    st.session_state["chat_sid"] = sid
+    if st.context.cookies.get(SESSION_COOKIE) != sid and not st.session_state.get("chat_sid_cookie_set"):
+        _set_session_cookie(sid)
+        st.session_state["chat_sid_cookie_set"] = True
+    return sid
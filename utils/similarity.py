@@ -0,0 +1,192 @@
+# utils/similarity.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.derived_indicators import ID_COLUMN, indicator_to_matrix
+from utils.trends import interpolate_gaps
+
+SIMILARITY_METRICS = {
+    "Euclídea": "euclidean",
+    "Correlación": "correlation",
+    "DTW (banda estrecha)": "dtw",
+}
+
+# Ancho de banda (en años) de la DTW simplificada y número de pares por bloque
+DTW_WINDOW = 2
+DTW_CHUNK = 50_000
+
+
+def region_codes(df: pd.DataFrame) -> pd.Index:
+    """
+    Devuelve los códigos de región del indicador con el mismo formato que
+    'id_region' en el shapefile (texto de 5 dígitos).
+    """
+    return pd.Index(df[ID_COLUMN].astype(str).str.strip().str.zfill(5))
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    """
+    Estandariza cada año entre regiones (media 0, desviación 1) para que los
+    indicadores con distintas unidades sean comparables. Los NaN se mantienen:
+    las distancias solo usan los años que tienen ambas regiones.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        return (values - mean) / np.where(std > 0, std, 1.0)
+
+
+def _pairwise_sums(z: np.ndarray):
+    """
+    Sumas sobre los años comunes a cada par de regiones (a = fila, b = columna):
+    (años comunes, Σa, Σb, Σa², Σb², Σab), todas matrices (n, n).
+    """
+    valid = (~np.isnan(z)).astype(float)
+    z0 = np.nan_to_num(z, nan=0.0)
+    sum_a = z0 @ valid.T
+    sum_aa = (z0 * z0) @ valid.T
+    return valid @ valid.T, sum_a, sum_a.T, sum_aa, sum_aa.T, z0 @ z0.T
+
+
+def _no_shared_years(dist: np.ndarray, common: np.ndarray, min_years: int = 1) -> np.ndarray:
+    """
+    NaN en los pares con menos de `min_years` años comunes; la diagonal es 0
+    salvo en las regiones sin ningún dato, que quedan enteras a NaN.
+    """
+    dist[common < min_years] = np.nan
+    np.fill_diagonal(dist, np.where(np.diag(common) > 0, 0.0, np.nan))
+    return dist
+
+
+def _euclidean_sq(z: np.ndarray) -> np.ndarray:
+    """
+    Matriz de distancias euclídeas al cuadrado sobre los años comunes de cada
+    par (Σa² + Σb² - 2·Σab), reescalada al total de años para que los pares
+    con huecos sean comparables con los completos.
+    """
+    common, _, _, sum_aa, sum_bb, sum_ab = _pairwise_sums(z)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d2 = np.maximum(sum_aa + sum_bb - 2.0 * sum_ab, 0.0) * z.shape[1] / common
+    return _no_shared_years(d2, common)
+
+
+def _correlation_distance(z: np.ndarray) -> np.ndarray:
+    """
+    1 - correlación de Pearson entre las series temporales de cada par de
+    regiones, sobre sus años comunes (hacen falta al menos dos). Una serie
+    constante da correlación 0 (distancia 1).
+    """
+    common, sum_a, sum_b, sum_aa, sum_bb, sum_ab = _pairwise_sums(z)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sum_ab - sum_a * sum_b / common
+        var_a = np.maximum(sum_aa - sum_a ** 2 / common, 0.0)
+        var_b = np.maximum(sum_bb - sum_b ** 2 / common, 0.0)
+        denom = np.sqrt(var_a * var_b)
+        corr = np.where(denom > 1e-12, cov / denom, 0.0)
+    return _no_shared_years(np.clip(1.0 - corr, 0.0, 2.0), common, min_years=2)
+
+
+def _dtw_distance(z: np.ndarray, window: int = DTW_WINDOW) -> np.ndarray:
+    """
+    DTW con banda de Sakoe-Chiba de `window` años. El recorrido de la matriz de
+    costes se hace una vez para todos los pares (i < j) a la vez, por bloques.
+    La DTW necesita series completas: los huecos de cada región se rellenan
+    por interpolación y, en los extremos, con el dato más cercano. Las
+    regiones sin ningún dato y los pares sin años comunes quedan a NaN.
+    """
+    common = _pairwise_sums(z)[0]
+    z = pd.DataFrame(interpolate_gaps(z, np.arange(z.shape[1])).T).ffill().bfill().to_numpy().T
+    n, t = z.shape
+    rows, cols = np.triu_indices(n, k=1)
+    dist = np.zeros((n, n))
+
+    for start in range(0, len(rows), DTW_CHUNK):
+        a = z[rows[start:start + DTW_CHUNK]]
+        b = z[cols[start:start + DTW_CHUNK]]
+        prev = np.full((len(a), t + 1), np.inf)
+        prev[:, 0] = 0.0
+        for i in range(1, t + 1):
+            cur = np.full_like(prev, np.inf)
+            for j in range(max(1, i - window), min(t, i + window) + 1):
+                cost = (a[:, i - 1] - b[:, j - 1]) ** 2
+                cur[:, j] = cost + np.minimum(np.minimum(prev[:, j], cur[:, j - 1]), prev[:, j - 1])
+            prev = cur
+        block = np.sqrt(prev[:, t])
+        dist[rows[start:start + DTW_CHUNK], cols[start:start + DTW_CHUNK]] = block
+        dist[cols[start:start + DTW_CHUNK], rows[start:start + DTW_CHUNK]] = block
+
+    return _no_shared_years(dist, common)
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def indicator_distance_matrix(df: pd.DataFrame, metric: str):
+    """
+    Matriz de distancias entre regiones para un único indicador.
+    Se cachea por el contenido del indicador y la métrica: si cambia un dataset,
+    solo se recalcula su bloque y el resto se reutiliza.
+    Devuelve (códigos, matriz). Para 'euclidean' la matriz contiene distancias al
+    cuadrado, de modo que varios indicadores se puedan sumar directamente.
+    """
+    _, _, values = indicator_to_matrix(df)
+    z = _standardize(values)
+
+    if metric == "euclidean":
+        dist = _euclidean_sq(z)
+    elif metric == "correlation":
+        dist = _correlation_distance(z)
+    elif metric == "dtw":
+        dist = _dtw_distance(z)
+    else:
+        raise ValueError(f"Métrica de similitud desconocida: {metric}")
+
+    return region_codes(df), dist
+
+
+def combined_distance_matrix(frames: list, metric: str):
+    """
+    Combina las matrices de varios indicadores en una sola, alineando las
+    regiones por código: suma de cuadrados para 'euclidean' y media para el
+    resto. Devuelve (códigos, matriz).
+    Si a un par le faltan algunos indicadores (región ausente o sin datos), la
+    suma euclídea se reescala a todos los indicadores (media de los bloques
+    disponibles × número de bloques) para no subestimar la distancia. Los pares
+    sin ningún indicador en común quedan como NaN.
+    """
+    blocks = [indicator_distance_matrix(df, metric) for df in frames]
+    codes = blocks[0][0]
+    for other_codes, _ in blocks[1:]:
+        codes = codes.union(other_codes, sort=False)
+
+    stacked = np.full((len(blocks), len(codes), len(codes)), np.nan)
+    for b, (block_codes, dist) in enumerate(blocks):
+        pos = codes.get_indexer(block_codes)
+        stacked[b][np.ix_(pos, pos)] = dist
+
+    n_finite = np.isfinite(stacked).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_block = np.nansum(stacked, axis=0) / n_finite
+    mean_block[n_finite == 0] = np.nan
+    combined = np.sqrt(mean_block * len(blocks)) if metric == "euclidean" else mean_block
+    return codes, combined
+
+
+def most_similar(codes: pd.Index, dist: np.ndarray, code: str, k: int = 5) -> pd.DataFrame:
+    """
+    Devuelve las k regiones más próximas a `code` (excluyéndola) ordenadas de
+    menor a mayor distancia, con columnas 'id_region' y 'Distancia'.
+    Las regiones sin distancia a `code` (NaN, sin indicadores en común) se descartan.
+    """
+    pos = codes.get_loc(code)
+    row = np.where(np.isnan(dist[pos]), np.inf, dist[pos])
+    row[pos] = np.inf
+
+    k = min(k, len(codes) - 1)
+    if k <= 0:
+        return pd.DataFrame(columns=["id_region", "Distancia"])
+    nearest = np.argpartition(row, k - 1)[:k]
+    nearest = nearest[np.argsort(row[nearest])]
+    nearest = nearest[np.isfinite(row[nearest])]
+
+    return pd.DataFrame({"id_region": codes[nearest], "Distancia": row[nearest]})
@@ -0,0 +1,330 @@
+# utils/spatial_stats.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_loader import load_shapefile, data_version
+
+LISA_LABELS = {
+    0: "No significativo",
+    1: "Alto-Alto",
+    2: "Bajo-Alto",
+    3: "Bajo-Bajo",
+    4: "Alto-Bajo",
+}
+LISA_COLORS = {
+    "Alto-Alto": "#d7191c",
+    "Bajo-Alto": "#abd9e9",
+    "Bajo-Bajo": "#2c7bb6",
+    "Alto-Bajo": "#fdae61",
+    "No significativo": "#eeeeee",
+    "Sin vecinos": "#bdbdbd",
+    "Sin datos": "#ffffff",
+}
+
+# Límite aproximado de elementos por bloque en las simulaciones por permutación
+PERMUTATION_BLOCK = 5_000_000
+
+
+class SparseWeights:
+    """
+    Matriz de pesos espaciales dispersa (formato CSR) y estandarizada por filas.
+    Cada fila i contiene los vecinos de la región i en el orden del shapefile.
+    """
+    def __init__(self, ids, neighbors_row, neighbors_col):
+        n = len(ids)
+        order = np.lexsort((neighbors_col, neighbors_row))
+        rows = np.asarray(neighbors_row)[order]
+        self.ids = pd.Index(ids)
+        self.n = n
+        self.indices = np.asarray(neighbors_col)[order].astype(np.int64)
+        self.cardinalities = np.bincount(rows, minlength=n)
+        self.indptr = np.concatenate(([0], np.cumsum(self.cardinalities)))
+        with np.errstate(divide="ignore"):
+            self.data = np.repeat(1.0 / np.maximum(self.cardinalities, 1), self.cardinalities)
+
+    def subset(self, keep: np.ndarray) -> "SparseWeights":
+        """
+        Pesos restringidos a las regiones de la máscara `keep` (en el mismo
+        orden), estandarizados de nuevo por filas: se eliminan los enlaces con
+        las regiones excluidas.
+        """
+        rows = np.repeat(np.arange(self.n), self.cardinalities)
+        edge = keep[rows] & keep[self.indices]
+        new_pos = np.cumsum(keep) - 1
+        return SparseWeights(self.ids[keep], new_pos[rows[edge]], new_pos[self.indices[edge]])
+
+    @property
+    def islands(self) -> np.ndarray:
+        """
+        Máscara de regiones sin ningún vecino.
+        """
+        return self.cardinalities == 0
+
+    def lag(self, values: np.ndarray, axis: int = 0) -> np.ndarray:
+        """
+        Retardo espacial W·X a lo largo del eje `axis` de `values` (el eje de las
+        regiones). Las islas quedan a 0.
+        """
+        gathered = np.take(values, self.indices, axis=axis)
+        shape = [1] * gathered.ndim
+        shape[axis] = -1
+        gathered = gathered * self.data.reshape(shape)
+
+        out = np.zeros(values.shape)
+        has_neighbors = ~self.islands
+        if len(self.indices):
+            sums = np.add.reduceat(gathered, self.indptr[:-1][has_neighbors], axis=axis)
+            target = [slice(None)] * values.ndim
+            target[axis] = has_neighbors
+            out[tuple(target)] = sums
+        return out
+
+
+def contiguity_weights(gdf, kind: str = "queen") -> SparseWeights:
+    """
+    Calcula la contigüidad entre polígonos usando el índice espacial en bloque
+    (sin comparar todos los pares). 'queen' considera vecinos a los polígonos que
+    comparten cualquier punto del borde; 'rook' exige compartir un tramo de borde.
+    """
+    import shapely
+
+    geoms = gdf.geometry.values
+    left, right = gdf.sindex.query(geoms, predicate="intersects")
+    keep = left != right
+    left, right = left[keep], right[keep]
+
+    if kind == "rook":
+        shared = shapely.intersection(np.asarray(geoms)[left], np.asarray(geoms)[right])
+        keep = shapely.length(shared) > 0
+        left, right = left[keep], right[keep]
+    elif kind != "queen":
+        raise ValueError(f"Tipo de contigüidad desconocido: {kind}")
+
+    # Simetrizar y eliminar duplicados
+    pairs = np.unique(np.concatenate([
+        np.stack([left, right], axis=1),
+        np.stack([right, left], axis=1),
+    ]), axis=0)
+    ids = gdf["id_region"].astype(str).str.strip().str.zfill(5)
+    return SparseWeights(ids, pairs[:, 0], pairs[:, 1])
+
+
+@st.cache_data(show_spinner=False)
+def _contiguity_weights_cached(shp_path: str, kind: str, version: str) -> SparseWeights:
+    return contiguity_weights(load_shapefile(shp_path), kind)
+
+
+def load_contiguity_weights(shp_path: str, kind: str = "queen") -> SparseWeights:
+    """
+    Pesos de contigüidad del shapefile, calculados una única vez por versión del
+    fichero y tipo.
+    """
+    return _contiguity_weights_cached(shp_path, kind, data_version(shp_path))
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    """
+    Centra cada columna (año) en su media. `values` no debe tener NaN (las
+    regiones sin dato se excluyen antes, ver _missing_patterns).
+    """
+    return values - values.mean(axis=0)
+
+
+def _missing_patterns(values: np.ndarray):
+    """
+    Agrupa los años por conjunto de regiones con dato: genera (máscara de
+    regiones con dato, columnas de los años con esa máscara). Normalmente
+    todos los años comparten máscara y se calculan en un solo bloque.
+    """
+    valid = ~np.isnan(values)
+    patterns, inverse = np.unique(valid.T, axis=0, return_inverse=True)
+    for p, keep in enumerate(patterns):
+        yield keep, np.flatnonzero(inverse.ravel() == p)
+
+
+def _folded_pseudo_p(observed: np.ndarray, simulated_ge: np.ndarray, permutations: int) -> np.ndarray:
+    """
+    Pseudo p-valor de una cola (hacia el extremo más cercano) a partir del número
+    de simulaciones mayores o iguales que el valor observado.
+    """
+    larger = np.where(permutations - simulated_ge < simulated_ge, permutations - simulated_ge, simulated_ge)
+    p = (larger + 1.0) / (permutations + 1.0)
+    return np.where(np.isnan(observed), np.nan, p)
+
+
+def moran_global(weights: SparseWeights, values: np.ndarray, permutations: int = 999, seed: int = 12345) -> pd.DataFrame:
+    """
+    I de Moran global para todas las columnas (años) de `values` (n, años) a la vez.
+    La inferencia por permutaciones se hace por lotes vectorizados.
+    Las regiones sin dato (NaN) en un año se excluyen del cálculo de ese año
+    (de la media, de los retardos y de las permutaciones).
+    Devuelve un DataFrame con columnas 'I', 'EI' y 'p_sim' (una fila por columna).
+    """
+    n_years = values.shape[1]
+    result = pd.DataFrame({"I": np.full(n_years, np.nan), "EI": np.nan, "p_sim": np.nan})
+    for keep, cols in _missing_patterns(values):
+        if keep.sum() < 3:
+            continue
+        sub = _moran_global_complete(weights.subset(keep), values[keep][:, cols], permutations, seed)
+        result.iloc[cols] = sub.to_numpy()
+    return result
+
+
+def _moran_global_complete(weights: SparseWeights, values: np.ndarray, permutations: int, seed: int) -> pd.DataFrame:
+    z = _standardize(values)
+    n = weights.n
+    s0 = float((~weights.islands).sum())
+    m2 = (z * z).sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        moran_i = (n / s0) * (z * weights.lag(z)).sum(axis=0) / m2
+
+    rng = np.random.default_rng(seed)
+    batch = max(1, PERMUTATION_BLOCK // max(1, len(weights.indices) * z.shape[1]))
+    count_ge = np.zeros(z.shape[1])
+    done = 0
+    while done < permutations:
+        size = min(batch, permutations - done)
+        perm = np.argsort(rng.random((size, n)), axis=1)
+        z_perm = z[perm]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sim = (n / s0) * (z_perm * weights.lag(z_perm, axis=1)).sum(axis=1) / m2
+        count_ge += (sim >= moran_i).sum(axis=0)
+        done += size
+
+    return pd.DataFrame({
+        "I": moran_i,
+        "EI": np.full(z.shape[1], -1.0 / (n - 1)),
+        "p_sim": _folded_pseudo_p(moran_i, count_ge, permutations),
+    })
+
+
+def moran_local(weights: SparseWeights, values: np.ndarray, permutations: int = 999, seed: int = 12345):
+    """
+    LISA (I de Moran local) para todas las regiones y años a la vez.
+    La inferencia usa permutación condicional: para cada región se reparten al
+    azar los valores del resto entre sus vecinos. Las regiones con el mismo
+    número de vecinos se simulan juntas en bloques vectorizados.
+    Las regiones sin dato (NaN) en un año quedan fuera de ese año: no cuentan
+    en la varianza, ni como vecinas, ni en las permutaciones, y su I y su p
+    son NaN. Las que se quedan sin vecinos con dato también tienen p NaN.
+    Devuelve (Is, p_sim, cuadrante), todos con forma (n, años).
+    """
+    n, n_years = values.shape
+    local_i = np.full((n, n_years), np.nan)
+    p_sim = np.full((n, n_years), np.nan)
+    quadrant = np.zeros((n, n_years), dtype=int)
+    for keep, cols in _missing_patterns(values):
+        if keep.sum() < 3:
+            continue
+        li, ps, q = _moran_local_complete(weights.subset(keep), values[keep][:, cols], permutations, seed)
+        local_i[np.ix_(keep, cols)] = li
+        p_sim[np.ix_(keep, cols)] = ps
+        quadrant[np.ix_(keep, cols)] = q
+    return local_i, p_sim, quadrant
+
+
+def _moran_local_complete(weights: SparseWeights, values: np.ndarray, permutations: int, seed: int):
+    z = _standardize(values)
+    n, n_years = z.shape
+    m2 = (z * z).sum(axis=0) / n
+    lag = weights.lag(z)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        local_i = z * lag / m2
+
+    quadrant = np.select(
+        [(z > 0) & (lag > 0), (z <= 0) & (lag > 0), (z <= 0) & (lag <= 0), (z > 0) & (lag <= 0)],
+        [1, 2, 3, 4],
+        default=0,
+    )
+    p_sim = np.full((n, n_years), np.nan)
+
+    max_k = int(weights.cardinalities.max()) if n else 0
+    if max_k == 0:
+        return local_i, p_sim, quadrant
+
+    # Extracciones sin reemplazo de los n-1 "otros" índices, compartidas por todas las regiones
+    rng = np.random.default_rng(seed)
+    keys = rng.random((permutations, n - 1))
+    draws = np.argpartition(keys, max_k - 1, axis=1)[:, :max_k]
+    draws = np.take_along_axis(draws, np.argsort(np.take_along_axis(keys, draws, axis=1), axis=1), axis=1)
+
+    for k in np.unique(weights.cardinalities):
+        if k == 0:
+            continue
+        obs = np.flatnonzero(weights.cardinalities == k)
+        block = max(1, PERMUTATION_BLOCK // (permutations * k * n_years))
+        for start in range(0, len(obs), block):
+            chunk = obs[start:start + block]
+            idx = draws[None, :, :k]
+            idx = idx + (idx >= chunk[:, None, None])  # saltar la propia región
+            sim_lag = z[idx].mean(axis=2)  # (regiones, permutaciones, años)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sim_i = z[chunk][:, None, :] * sim_lag / m2
+            count_ge = (sim_i >= local_i[chunk][:, None, :]).sum(axis=1)
+            p_sim[chunk] = _folded_pseudo_p(local_i[chunk], count_ge, permutations)
+
+    local_i[weights.islands] = np.nan
+    p_sim[weights.islands] = np.nan
+    return local_i, p_sim, quadrant
+
+
+def lisa_cluster_labels(p_sim: np.ndarray, quadrant: np.ndarray, islands: np.ndarray, alpha: float = 0.05,
+                        missing: np.ndarray = None) -> np.ndarray:
+    """
+    Etiqueta cada región/año como Alto-Alto, Bajo-Bajo, Alto-Bajo, Bajo-Alto,
+    No significativo, Sin vecinos o Sin datos. `islands` puede ser por región
+    (n,) o por región y año (n, años); `missing` marca las regiones/años sin dato.
+    """
+    codes = np.where(p_sim <= alpha, quadrant, 0)
+    labels = np.vectorize(LISA_LABELS.get, otypes=[object])(codes)
+    labels[islands] = "Sin vecinos"
+    if missing is not None:
+        labels[missing] = "Sin datos"
+    return labels
+
+
+def spatial_autocorrelation(shp_path: str, kind: str, region_ids: tuple, values: np.ndarray,
+                            permutations: int = 999, alpha: float = 0.05):
+    """
+    Moran global y LISA cacheados por versión del shapefile (ver
+    `_spatial_autocorrelation_cached`).
+    """
+    return _spatial_autocorrelation_cached(
+        shp_path, data_version(shp_path), kind, region_ids, values, permutations, alpha
+    )
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _spatial_autocorrelation_cached(shp_path: str, version: str, kind: str, region_ids: tuple,
+                                    values: np.ndarray, permutations: int, alpha: float):
+    """
+    Calcula Moran global y LISA para todas las columnas de `values` (regiones en
+    el orden de `region_ids`, una columna por año) usando los pesos cacheados del
+    shapefile. Devuelve (DataFrame de Moran global, matriz de etiquetas LISA,
+    matriz de pseudo p-valores), alineados con `region_ids`.
+    """
+    weights = _contiguity_weights_cached(shp_path, kind, version)
+    pos = weights.ids.get_indexer(list(region_ids))
+
+    # Reordenar los valores al orden de los pesos (regiones sin datos -> NaN)
+    aligned = np.full((weights.n, values.shape[1]), np.nan)
+    matched = pos >= 0
+    aligned[pos[matched]] = values[matched]
+
+    global_df = moran_global(weights, aligned, permutations)
+    _, p_sim, quadrant = moran_local(weights, aligned, permutations)
+
+    # Sin vecinos: islas del mapa o regiones cuyos vecinos no tienen dato ese año
+    missing = np.isnan(aligned)
+    no_neighbors = weights.lag((~missing).astype(float)) == 0
+    labels = lisa_cluster_labels(p_sim, quadrant, no_neighbors, alpha, missing)
+
+    labels_out = np.full((len(region_ids), values.shape[1]), "Sin datos", dtype=object)
+    p_out = np.full((len(region_ids), values.shape[1]), np.nan)
+    labels_out[matched] = labels[pos[matched]]
+    p_out[matched] = p_sim[pos[matched]]
+    return global_df, labels_out, p_out
@@ -1,18 +1,44 @@
 import os
-import json
+import uuid
 from datetime import datetime
-from openai import OpenAI
 import streamlit as st
 
+from utils.interview_store import save_interview
+
+
+@st.cache_resource
+def get_openai_client():
+    """
+    Cliente de OpenAI compartido por todas las sesiones. Se obtiene la API key
+    desde los secretos de Streamlit Cloud.
+    """
+    from openai import OpenAI
+
+    return OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+
+
 class TerritorialChat:
     """
     Clase que maneja el flujo de una conversación enfocada en desarrollo territorial.
-    Se mantiene el uso de self.client = OpenAI(api_key=...) para la conexión con la API.
+    El cliente de OpenAI (self.client) se crea la primera vez que se necesita,
+    de modo que la librería openai no se importa al cargar la página.
+    El estado de la entrevista se puede serializar (to_dict / from_dict) para
+    guardarlo fuera de la sesión de Streamlit (ver utils/session_store.py).
     """
-    def __init__(self):
-        # Se obtiene la API key desde los secretos de Streamlit Cloud.
-        self.client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    # Atributos que forman el estado de una entrevista (el resto son constantes)
+    STATE_FIELDS = [
+        "interview_id",
+        "user_name",
+        "chat_complete",
+        "conversation_history",
+        "mandatory_index",
+        "follow_up_count",
+        "collected_data",
+    ]
 
+    def __init__(self):
+        # Identificador de la entrevista en el almacén (el mismo en cada guardado)
+        self.interview_id = uuid.uuid4().hex
         # Nombre del usuario (se define tras la primera respuesta)
         self.user_name = None
         # Indica si todas las preguntas obligatorias ya fueron respondidas
@@ -52,6 +78,30 @@ class TerritorialChat:
         # Ruta del archivo JSON donde se guardará la información al final
         self.json_file_path = os.path.join("data", "json_folder", "territorial_data.json")
 
+    @property
+    def client(self):
+        """
+        Cliente de OpenAI (compartido, ver get_openai_client).
+        """
+        return get_openai_client()
+
+    def to_dict(self) -> dict:
+        """
+        Estado serializable (JSON) de la entrevista.
+        """
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "TerritorialChat":
+        """
+        Reconstruye una entrevista a partir de to_dict().
+        """
+        chat = cls()
+        for field in cls.STATE_FIELDS:
+            if field in state:
+                setattr(chat, field, state[field])
+        return chat
+
     def add_user_answer(self, user_input: str):
         """
         Procesa la respuesta del usuario en el flujo de la conversación.
@@ -104,9 +154,18 @@ class TerritorialChat:
     def generate_follow_up_question(self, user_input: str):
         """
         Genera una pregunta de seguimiento basada en la respuesta del usuario.
+        Si el cliente de OpenAI no se puede crear (falta OPENAI_API_KEY en los
+        secretos o la librería openai) se muestra el error en la página en lugar
+        de omitir la pregunta en silencio.
         """
         try:
-            completion = self.client.chat.completions.create(
+            client = self.client
+        except Exception as e:
+            st.error(f"El chat no está configurado correctamente (OPENAI_API_KEY): {e}")
+            return None
+
+        try:
+            completion = client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
                     {
@@ -134,26 +193,26 @@ class TerritorialChat:
     def save_data_to_json(self):
         """
         Guarda la sesión actual (fecha y datos recopilados) en un archivo JSON.
+        Volver a guardar la misma entrevista sustituye su entrada anterior.
+        Si la entrevista está completa, se encola para la extracción estructurada
+        en segundo plano (el usuario no espera a la llamada al LLM).
         """
         new_entry = {
+            "id": self.interview_id,
             "timestamp": datetime.now().isoformat(),
             "territorial_info": self.collected_data
         }
         try:
-            if os.path.exists(self.json_file_path):
-                with open(self.json_file_path, "r", encoding="utf-8") as f:
-                    existing_data = json.load(f)
-                if not isinstance(existing_data, list):
-                    existing_data = [existing_data]
-            else:
-                existing_data = []
-
-            existing_data.append(new_entry)
-            os.makedirs(os.path.dirname(self.json_file_path), exist_ok=True)
-
-            with open(self.json_file_path, "w", encoding="utf-8") as f:
-                json.dump(existing_data, f, indent=4, ensure_ascii=False)
-
+            save_interview(self.json_file_path, new_entry)
             st.success(f"Datos guardados en {self.json_file_path}")
         except Exception as e:
             st.error(f"Error al guardar datos: {e}")
+            return
+
+        if self.chat_complete:
+            from utils.interview_jobs import get_job_queue
+
+            try:
+                get_job_queue().enqueue(new_entry["id"])
+            except Exception as e:
+                st.warning(f"No se pudo encolar el procesado de la entrevista: {e}")
@@ -0,0 +1,151 @@
+# utils/trends.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Nombre visible -> método de ajuste
+TREND_METHODS = {
+    "Lineal (mínimos cuadrados)": "linear",
+    "Robusta (Theil-Sen)": "theil_sen",
+}
+MAX_PROJECTION_YEARS = 5
+
+
+def interpolate_gaps(values: np.ndarray, years: np.ndarray) -> np.ndarray:
+    """
+    Interpolación lineal de los huecos (NaN) interiores de cada fila de una
+    matriz regiones × años, todas las filas a la vez. Los huecos al principio o
+    al final de la serie se dejan como NaN (eso sería extrapolar).
+    Las columnas pueden venir en cualquier orden de años.
+    """
+    order = np.argsort(years)
+    x = np.asarray(years, dtype=float)[order]
+    y = np.asarray(values, dtype=float)[:, order]
+    n_years = y.shape[1]
+
+    valid = ~np.isnan(y)
+    cols = np.arange(n_years)
+    # Índice del último dato válido a la izquierda y del primero a la derecha
+    prev_idx = np.maximum.accumulate(np.where(valid, cols, -1), axis=1)
+    next_idx = np.minimum.accumulate(np.where(valid, cols, n_years)[:, ::-1], axis=1)[:, ::-1]
+    gaps = ~valid & (prev_idx >= 0) & (next_idx < n_years)
+
+    prev_safe = np.clip(prev_idx, 0, n_years - 1)
+    next_safe = np.clip(next_idx, 0, n_years - 1)
+    y_prev = np.take_along_axis(y, prev_safe, axis=1)
+    y_next = np.take_along_axis(y, next_safe, axis=1)
+    x_prev, x_next = x[prev_safe], x[next_safe]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        interpolated = y_prev + (y_next - y_prev) * (x - x_prev) / (x_next - x_prev)
+
+    filled = np.where(gaps, interpolated, y)
+    result = np.empty_like(filled)
+    result[:, order] = filled
+    return result
+
+
+def linear_trend(values: np.ndarray, years: np.ndarray):
+    """
+    Recta de mínimos cuadrados de cada fila (ignorando NaN), resuelta para todas
+    las filas a la vez con las ecuaciones normales. Devuelve (pendiente,
+    ordenada en el origen); NaN en filas con menos de dos datos.
+    """
+    y = np.asarray(values, dtype=float)
+    valid = ~np.isnan(y)
+    x = np.where(valid, np.asarray(years, dtype=float), 0.0)
+    count = valid.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = x.sum(axis=1) / count
+        y_mean = np.where(valid, y, 0.0).sum(axis=1) / count
+        dx = np.where(valid, x - x_mean[:, None], 0.0)
+        dy = np.where(valid, y - y_mean[:, None], 0.0)
+        sxx = (dx * dx).sum(axis=1)
+        slope = (dx * dy).sum(axis=1) / sxx
+    slope[(count < 2) | (sxx == 0)] = np.nan
+    return slope, y_mean - slope * x_mean
+
+
+def theil_sen_trend(values: np.ndarray, years: np.ndarray):
+    """
+    Estimador robusto de Theil-Sen: pendiente = mediana de las pendientes entre
+    todos los pares de años, ordenada = mediana de y - pendiente·x. Todas las
+    filas a la vez: la matriz intermedia es regiones × pares de años.
+    """
+    y = np.asarray(values, dtype=float)
+    x = np.asarray(years, dtype=float)
+    i, j = np.triu_indices(len(x), k=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pair_slopes = (y[:, j] - y[:, i]) / (x[j] - x[i])
+
+    slope = np.full(y.shape[0], np.nan)
+    intercept = np.full(y.shape[0], np.nan)
+    has_pair = ~np.isnan(pair_slopes).all(axis=1)
+    if has_pair.any():
+        slope[has_pair] = np.nanmedian(pair_slopes[has_pair], axis=1)
+        residual = y[has_pair] - slope[has_pair, None] * x
+        intercept[has_pair] = np.nanmedian(residual, axis=1)
+    return slope, intercept
+
+
+TREND_FUNCTIONS = {
+    "linear": linear_trend,
+    "theil_sen": theil_sen_trend,
+}
+
+
+@st.cache_data(max_entries=128, show_spinner=False)
+def fill_and_fit(values: np.ndarray, years: tuple, method: str = "linear", horizon: int = 0):
+    """
+    Rellena huecos y ajusta tendencias de una matriz regiones × años completa.
+    La caché se indexa por el contenido de `values`, que cambia con la versión
+    de los datos, así que cada versión se calcula una sola vez.
+
+    Devuelve (valores rellenados, pendiente, ordenada, años de la tendencia,
+    matriz de la tendencia). Los años de la tendencia van en orden ascendente
+    del primer año con datos al último más `horizon` años de proyección.
+    La tendencia se ajusta sobre los datos originales, no sobre los interpolados.
+    """
+    years_arr = np.asarray(years, dtype=int)
+    filled = interpolate_gaps(values, years_arr)
+    slope, intercept = TREND_FUNCTIONS[method](values, years_arr)
+
+    trend_years = np.arange(years_arr.min(), years_arr.max() + horizon + 1)
+    trend = intercept[:, None] + slope[:, None] * trend_years
+    return filled, slope, intercept, trend_years, trend
+
+
+def fill_year_gaps(gdf_merged, year_columns: list):
+    """
+    Devuelve una copia de gdf_merged con los huecos interiores de las columnas
+    de año (ya numéricas) interpolados, y el número de valores rellenados.
+    """
+    values = gdf_merged[year_columns].to_numpy(dtype=float)
+    filled = fill_and_fit(values, tuple(int(y) for y in year_columns))[0]
+    gdf_filled = gdf_merged.copy()
+    gdf_filled[year_columns] = filled
+    return gdf_filled, int(np.isnan(values).sum() - np.isnan(filled).sum())
+
+
+def trend_long_format(gdf_merged, year_columns: list, comarcas: list, method: str = "linear",
+                      horizon: int = 0) -> pd.DataFrame:
+    """
+    Tendencia (y proyección) de las comarcas indicadas en formato largo:
+    columnas 'COMARCA', 'Año' (int), 'Tendencia' y 'Pendiente'.
+    El ajuste se hace sobre todas las comarcas a la vez (cacheado) y después se
+    seleccionan las pedidas.
+    """
+    values = gdf_merged[year_columns].to_numpy(dtype=float)
+    _, slope, _, trend_years, trend = fill_and_fit(
+        values, tuple(int(y) for y in year_columns), method, horizon
+    )
+    names = gdf_merged["COMARCA"].to_numpy()
+    rows = [np.flatnonzero(names == comarca)[0] for comarca in comarcas if comarca in names]
+
+    return pd.DataFrame({
+        "COMARCA": np.repeat(names[rows], len(trend_years)),
+        "Año": np.tile(trend_years, len(rows)),
+        "Tendencia": trend[rows].ravel(),
+        "Pendiente": np.repeat(slope[rows], len(trend_years)),
+    })